@@ -0,0 +1,98 @@
+# ML-Model/build_dataset.py
+"""
+Extract training samples from labelled videos into a memmap dataset
+(utils.dataset), so training never decodes video again.
+
+    python ML-Model/build_dataset.py <videos_dir> <out_dir> [--kind faces|silhouettes]
+
+<videos_dir> holds one sub-directory per label (e.g. real/, fake/); the label
+id is the sub-directory's position in sorted order.
+  faces:       one sample per detected face -- uint8 crop (128x128x3), label
+  silhouettes: one sample per silhouette -- bit-packed 64x44 mask, label
+Metadata (video, frame index, timestamp, box) goes to meta.jsonl.
+
+Read it back with:
+    from utils.dataset import MemmapDataset, PrefetchLoader
+    for batch in PrefetchLoader(MemmapDataset(out_dir), batch_size=64): ...
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from utils.processing import extract_frames, detect_faces_in_frame
+from utils.crops import FEATURE_CROP
+from utils.silhouette import SilhouetteStage, SIL_SIZE
+from utils.dataset import DatasetWriter
+from utils import resources
+
+VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv"}
+
+
+def labelled_videos(root):
+    labels = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+    for label_id, label in enumerate(labels):
+        for name in sorted(os.listdir(os.path.join(root, label))):
+            if os.path.splitext(name)[1].lower() in VIDEO_EXTS:
+                yield os.path.join(root, label, name), label_id, label
+
+
+def add_faces(writer, path, label_id, sample_seconds):
+    with open(path, "rb") as f:
+        frames = extract_frames(f, fps_sample=sample_seconds)
+    frames_faces = [(frame, [list(map(int, b)) for b in detect_faces_in_frame(frame)]) for _, _, frame in frames]
+    with resources.borrow("crops_features") as stage:
+        crops, owners = stage(frames_faces)
+        if not len(crops):
+            return 0
+        # crops come out frame by frame, faces in box order
+        metas = [{"video": path, "frame": int(idx), "timestamp": float(ts), "bbox": box}
+                 for (idx, ts, _), (_, boxes) in zip(frames, frames_faces) for box in boxes]
+        writer.add_batch({"crop": crops, "label": np.full(len(crops), label_id, np.int16)}, metas)
+        return len(crops)
+
+
+def add_silhouettes(writer, path, label_id, sample_seconds):
+    stage = SilhouetteStage()
+    with open(path, "rb") as f:
+        # every frame feeds the background model; the sampled frames themselves are not needed
+        extract_frames(f, fps_sample=sample_seconds, frame_callback=stage.feed)
+    packed, indices = stage.silhouettes()
+    if not len(packed):
+        return 0
+    writer.add_batch({"silhouette": packed, "label": np.full(len(packed), label_id, np.int16)},
+                     [{"video": path, "frame": int(i)} for i in indices])
+    return len(packed)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("videos_dir")
+    ap.add_argument("out_dir")
+    ap.add_argument("--kind", choices=["faces", "silhouettes"], default="faces")
+    ap.add_argument("--sample-seconds", type=float, default=1.0)
+    ap.add_argument("--shard-size", type=int, default=4096)
+    args = ap.parse_args()
+
+    if args.kind == "faces":
+        fields = {"crop": ((FEATURE_CROP, FEATURE_CROP, 3), np.uint8), "label": ((), np.int16)}
+        add = add_faces
+    else:
+        fields = {"silhouette": (((SIL_SIZE[0] * SIL_SIZE[1] + 7) // 8,), np.uint8), "label": ((), np.int16)}
+        add = add_silhouettes
+
+    t0 = time.perf_counter()
+    total = 0
+    with DatasetWriter(args.out_dir, fields, shard_size=args.shard_size) as writer:
+        for path, label_id, label in labelled_videos(args.videos_dir):
+            n = add(writer, path, label_id, args.sample_seconds)
+            total += n
+            print(f"{label:>10}  {n:>6}  {path}")
+    print(f"{total} samples in {len(writer.shards)} shards, {time.perf_counter() - t0:.1f}s -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+# api.py
+"""
+Local HTTP inference service over the utils analyzers (no Streamlit).
+
+    python api.py [--host 127.0.0.1] [--port 8502] [--workers N] [--queue M]
+
+    POST /v1/image   multipart/form-data, field "file"            -> analyze_image
+    POST /v1/video   multipart/form-data, field "file"            -> analyze_video
+                     (?sample_seconds=1&segments=1&detect_workers=0,
+                      early_exit=1&max_frames=&time_budget= for sequential early exit,
+                      which excludes segments / detect_workers;
+                      long=1&window_seconds=60 for windowed, resumable long-clip mode)
+    POST /v1/text    application/json {"text": "..."} or form field "text" -> analyze_text
+    GET  /healthz    queue / worker counters
+
+Add ?images=1 to image / video requests to get the annotated image and
+contact sheet back as base64 PNG (omitted by default).
+
+Plain asyncio HTTP/1.1 with keep-alive: the event loop only parses requests
+and streams multipart bodies to spooled temp files; the analyzers run in a
+bounded thread pool. At most `workers` analyses run and `queue` more wait --
+anything beyond that is refused with 429 + Retry-After before its body is
+read, so a burst cannot pile up uploads in memory.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from utils import runtime
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_MB = int(os.environ.get("DEEPSECURE_API_MAX_UPLOAD_MB", "512"))
+SPOOL_BYTES = 8 * 1024 * 1024     # uploads above this go to a temp file on disk
+READ_CHUNK = 256 * 1024
+KEEPALIVE_TIMEOUT = 15            # seconds an idle connection is kept open
+MAX_HEADER_BYTES = 64 * 1024
+MAX_FIELD_BYTES = 1024 * 1024     # non-file form fields / JSON bodies
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 415: "Unsupported Media Type",
+           429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# -------------------------------
+# STREAMING MULTIPART
+# -------------------------------
+def _header_params(value):
+    """'form-data; name="file"; filename="a.jpg"' -> ('form-data', {name:..., filename:...})."""
+    parts = [p.strip() for p in value.split(";")]
+    params = {}
+    for p in parts[1:]:
+        if "=" in p:
+            k, v = p.split("=", 1)
+            params[k.strip().lower()] = v.strip().strip('"')
+    return parts[0].lower(), params
+
+
+async def read_multipart(reader, length, boundary):
+    """
+    Parse a multipart body of `length` bytes as it arrives. File parts are
+    streamed into SpooledTemporaryFiles (rewound); other fields become str.
+    Returns {name: str | file}.
+    """
+    delim = b"\r\n--" + boundary.encode("latin-1")
+    fields = {}
+    remaining = length
+    # a leading CRLF makes the first boundary look like every later one
+    buf = b"\r\n"
+    state = "preamble"
+    sink = None
+    name = None
+
+    async def more():
+        nonlocal buf, remaining
+        if remaining <= 0:
+            raise HTTPError(400, "truncated multipart body")
+        chunk = await reader.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            raise HTTPError(400, "connection closed mid-body")
+        remaining -= len(chunk)
+        buf += chunk
+
+    while True:
+        if state == "preamble":
+            i = buf.find(delim)
+            if i < 0:
+                buf = buf[-(len(delim) - 1):]
+                await more()
+                continue
+            buf = buf[i + len(delim):]
+            state = "after_delim"
+        elif state == "after_delim":
+            while len(buf) < 2:
+                await more()
+            if buf[:2] == b"--":
+                break
+            if buf[:2] != b"\r\n":
+                raise HTTPError(400, "malformed multipart boundary")
+            buf = buf[2:]
+            state = "headers"
+        elif state == "headers":
+            i = buf.find(b"\r\n\r\n")
+            if i < 0:
+                if len(buf) > MAX_HEADER_BYTES:
+                    raise HTTPError(400, "multipart part headers too large")
+                await more()
+                continue
+            headers = {}
+            for line in buf[:i].decode("latin-1").split("\r\n"):
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            buf = buf[i + 4:]
+            _, params = _header_params(headers.get("content-disposition", ""))
+            name = params.get("name", "")
+            if "filename" in params:
+                sink = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+            else:
+                sink = bytearray()
+            state = "data"
+        elif state == "data":
+            i = buf.find(delim)
+            if i < 0:
+                # keep a tail that could be the start of a split delimiter
+                keep = len(delim) - 1
+                if len(buf) > keep:
+                    out, buf = buf[:-keep], buf[-keep:]
+                    _sink_write(sink, out)
+                await more()
+                continue
+            _sink_write(sink, buf[:i])
+            buf = buf[i + len(delim):]
+            if isinstance(sink, bytearray):
+                fields[name] = sink.decode("utf-8", "replace")
+            else:
+                sink.seek(0)
+                fields[name] = sink
+            sink = None
+            state = "after_delim"
+
+    # drain the epilogue so the connection can be reused
+    while remaining > 0:
+        chunk = await reader.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+    return fields
+
+
+def _sink_write(sink, data):
+    if isinstance(sink, bytearray):
+        if len(sink) + len(data) > MAX_FIELD_BYTES:
+            raise HTTPError(413, "form field too large")
+        sink += data
+    else:
+        sink.write(data)
+
+
+# -------------------------------
+# RESULT SERIALIZATION
+# -------------------------------
+def _jsonable(obj, images):
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if hasattr(v, "getvalue") or isinstance(v, (bytes, bytearray)):
+                if images:
+                    data = v.getvalue() if hasattr(v, "getvalue") else bytes(v)
+                    out[k] = base64.b64encode(data).decode("ascii")
+                continue
+            out[k] = _jsonable(v, images)
+        return out
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v, images) for v in obj]
+    if hasattr(obj, "tolist"):  # numpy scalars / arrays
+        return obj.tolist()
+    return obj
+
+
+def _video_result(res):
+    """Drop per-frame payloads that only make sense in the UI."""
+    res = dict(res)
+    res.pop("source", None)  # server-side path of the stored upload (long mode)
+    res["frames_info"] = [{k: v for k, v in fi.items() if k not in ("thumbnail", "source")}
+                          for fi in res.get("frames_info", [])]
+    if res.get("gait"):
+        # raw silhouette / GEI arrays stay server-side; the GEI PNG follows ?images=1
+        res["gait"] = {k: v for k, v in res["gait"].items() if k not in ("silhouettes", "silhouette_frames", "gei")}
+    return res
+
+
+# -------------------------------
+# SERVER
+# -------------------------------
+class InferenceServer:
+    def __init__(self, workers=None, queue=None):
+        self.workers = workers or runtime.available_cpus()
+        self.queue = self.workers * 2 if queue is None else queue
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="infer")
+        self.admitted = 0     # running + waiting for a worker (event-loop thread only)
+        self.served = 0
+        self.rejected = 0
+        self.started = time.time()
+
+    # ---- admission ----
+    def _admit(self):
+        if self.admitted >= self.workers + self.queue:
+            self.rejected += 1
+            return False
+        self.admitted += 1
+        return True
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # ---- handlers ----
+    async def _image(self, fields, query):
+        from PIL import UnidentifiedImageError
+        from utils.image_model import analyze_image
+        f = fields.get("file")
+        if f is None or isinstance(f, str):
+            raise HTTPError(400, 'expected a file field named "file"')
+        try:
+            res = await self._run(analyze_image, f)
+        except (UnidentifiedImageError, ValueError):
+            raise HTTPError(400, "could not decode this image")
+        return _jsonable(res, query.get("images") == "1")
+
+    async def _video(self, fields, query):
+        from utils.video_model import analyze_video, analyze_long_video
+        f = fields.get("file")
+        if f is None or isinstance(f, str):
+            raise HTTPError(400, 'expected a file field named "file"')
+        try:
+            kwargs = {k: int(query[k]) for k in ("sample_seconds", "segments", "detect_workers", "max_frames",
+                                                 "window_seconds") if k in query}
+            if "time_budget" in query:
+                kwargs["time_budget"] = float(query["time_budget"])
+        except ValueError:
+            raise HTTPError(400, "sample_seconds / segments / detect_workers / max_frames / window_seconds "
+                                 "must be integers")
+        early_exit = query.get("early_exit") == "1"
+        if early_exit and (kwargs.get("segments", 1) > 1 or kwargs.get("detect_workers", 0) > 0):
+            raise HTTPError(400, "early_exit=1 decodes in one pass; it cannot be combined with segments / "
+                                 "detect_workers")
+        if not early_exit and ("max_frames" in kwargs or "time_budget" in kwargs):
+            raise HTTPError(400, "max_frames / time_budget only apply with early_exit=1")
+        if query.get("long") == "1":
+            extra = sorted(set(kwargs) - {"sample_seconds", "window_seconds"}) + ["early_exit"] * early_exit
+            if extra:
+                raise HTTPError(400, f"long=1 takes only sample_seconds / window_seconds, not {', '.join(extra)}")
+            # windowed + checkpointed: a retried request resumes where the last one stopped
+            analyze = analyze_long_video
+        else:
+            kwargs.pop("window_seconds", None)
+            kwargs["early_exit"] = early_exit
+            analyze = analyze_video
+        try:
+            res = _video_result(await self._run(lambda: analyze(f, **kwargs)))
+        except ValueError:
+            raise HTTPError(400, "could not decode this video")
+        return _jsonable(res, query.get("images") == "1")
+
+    async def _text(self, fields, query):
+        from utils.text_model import analyze_text
+        text = fields.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(400, 'expected a non-empty "text"')
+        return _jsonable(await self._run(analyze_text, text), False)
+
+    def _health(self):
+        return {"workers": self.workers, "queue": self.queue, "admitted": self.admitted,
+                "running": min(self.admitted, self.workers), "served": self.served, "rejected": self.rejected,
+                "uptime": round(time.time() - self.started, 1), "runtime": runtime.report()}
+
+    # ---- HTTP/1.1 ----
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 400, {"error": "headers too large"}, close=True)
+                    return
+                keep_alive = await self._request(reader, writer, head)
+                if not keep_alive:
+                    return
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _request(self, reader, writer, head):
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            await self._send(writer, 400, {"error": "bad request line"}, close=True)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        conn_hdr = headers.get("connection", "").lower()
+        keep_alive = conn_hdr != "close" if version == "HTTP/1.1" else conn_hdr == "keep-alive"
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        routes = {"/v1/image": self._image, "/v1/video": self._video, "/v1/text": self._text}
+        if url.path == "/healthz" and method == "GET":
+            await self._send(writer, 200, self._health(), close=not keep_alive)
+            return keep_alive
+        handler = routes.get(url.path)
+        if handler is None or method != "POST":
+            status = 404 if handler is None and url.path != "/healthz" else 405
+            # body (if any) was not read, so the connection cannot be reused
+            await self._send(writer, status, {"error": REASONS[status]}, close=True)
+            return False
+        if "content-length" not in headers:
+            await self._send(writer, 411, {"error": "Content-Length required"}, close=True)
+            return False
+        raw_length = headers["content-length"].strip()
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            await self._send(writer, 400, {"error": "invalid Content-Length"}, close=True)
+            return False
+        length = int(raw_length)
+        if length > MAX_UPLOAD_MB * 1024 * 1024:
+            await self._send(writer, 413, {"error": f"upload exceeds {MAX_UPLOAD_MB} MB"}, close=True)
+            return False
+        # back-pressure before the body is read: a refused upload costs nothing
+        if not self._admit():
+            await self._send(writer, 429, {"error": "server busy, retry later"}, close=True,
+                             extra={"Retry-After": "1"})
+            return False
+
+        fields = {}
+        try:
+            fields = await self._read_body(reader, headers, length)
+            payload = await handler(fields, query)
+            self.served += 1
+            await self._send(writer, 200, payload, close=not keep_alive)
+            return keep_alive
+        except HTTPError as e:
+            await self._send(writer, e.status, {"error": e.message}, close=True)
+            return False
+        except Exception:
+            # details go to the server log, not to the client
+            logger.exception("%s %s failed", method, url.path)
+            await self._send(writer, 500, {"error": REASONS[500]}, close=True)
+            return False
+        finally:
+            self.admitted -= 1
+            for v in fields.values():
+                if hasattr(v, "close"):
+                    v.close()
+
+    async def _read_body(self, reader, headers, length):
+        ctype, params = _header_params(headers.get("content-type", ""))
+        if ctype == "multipart/form-data":
+            if "boundary" not in params:
+                raise HTTPError(400, "multipart boundary missing")
+            return await read_multipart(reader, length, params["boundary"])
+        if length > MAX_FIELD_BYTES:
+            raise HTTPError(413, "body too large for a non-multipart request")
+        body = await reader.readexactly(length) if length else b""
+        if ctype == "application/json":
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                raise HTTPError(400, "invalid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "expected a JSON object")
+            return data
+        raise HTTPError(415, "use multipart/form-data or application/json")
+
+    async def _send(self, writer, status, payload, close=False, extra=None):
+        body = json.dumps(payload).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                "Connection: close" if close else f"Keep-Alive: timeout={KEEPALIVE_TIMEOUT}"]
+        for k, v in (extra or {}).items():
+            head.append(f"{k}: {v}")
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        # analyses run `workers` at a time: split OpenCV / BLAS threads between them
+        with runtime.pooled(self.workers):
+            async with server:
+                await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8502)
+    ap.add_argument("--workers", type=int, default=None, help="concurrent analyses (default: CPU count)")
+    ap.add_argument("--queue", type=int, default=None, help="requests allowed to wait (default: 2 x workers)")
+    ap.add_argument("--warmup", action="store_true", help="build detectors / indexes before serving")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.warmup:
+        from utils import resources
+        print(f"warmup: {resources.warmup()}")
+        print(f"runtime: {runtime.report()}")
+    srv = InferenceServer(workers=args.workers, queue=args.queue)
+    print(f"DeepSecure API on http://{args.host}:{args.port} "
+          f"({srv.workers} workers, {srv.queue} queued)")
+    try:
+        asyncio.run(srv.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
+import logging
+import os
+import threading
 import streamlit as st
-from streamlit_lottie import st_lottie
-import requests
-from utils.image_model import analyze_image
-from utils.video_model import analyze_video
 from utils.text_model import analyze_text
 import streamlit.components.v1 as components
+from utils import runtime
+
+logger = logging.getLogger(__name__)
+
+# NOTE: heavy modules (cv2 / numpy / PIL via utils.image_model & utils.video_model,
+# requests, streamlit_lottie) are imported inside the functions that need them so
+# that Home / About reruns don't pay for them. See benchmarks/bench_import_time.py.
 
 # optionally import your auth functions
 try:
-    from utils.sql_auth import register_user, authenticate_user
+    from utils.sql_auth import register_user, login_user, verify_session, logout_session
 except Exception:
-    from utils.sql_auth import register_user, authenticate_user  # fallback
+    from utils.sql_auth import register_user, login_user, verify_session, logout_session  # fallback
 
 
 # ----------------------- PAGE CONFIG -----------------------
@@ -22,6 +28,7 @@ st.set_page_config(page_title="DeepSecure.AI", page_icon="🧠", layout="wide")
 def load_lottie_url(url: str):
     """Load a Lottie animation from URL."""
     try:
+        import requests
         r = requests.get(url, timeout=6)
         if r.status_code == 200:
             return r.json()
@@ -30,6 +37,12 @@ def load_lottie_url(url: str):
     return None
 
 
+def st_lottie(*args, **kwargs):
+    """Lazy wrapper around streamlit_lottie.st_lottie."""
+    from streamlit_lottie import st_lottie as _st_lottie
+    return _st_lottie(*args, **kwargs)
+
+
 # ✅ Futuristic Animations (verified and working)
 LOTTIE_HERO = load_lottie_url("https://lottie.host/6a1f88e8-1e6a-4a28-b81a-43d40e35b7f2/ohYQrqxD8D.json")        # AI Brain Glow
 LOTTIE_PROCESS = load_lottie_url("https://lottie.host/20c4f34d-c96c-49c2-a17a-38c79c8b5799/ZOP3NymOBz.json")    # Data Processing Circuit
@@ -38,6 +51,20 @@ LOTTIE_SPARK = load_lottie_url("https://lottie.host/5aee33d1-dbe1-4b86-8b0d-02c9
 LOTTIE_FOOTER = load_lottie_url("https://lottie.host/04fae0a1-ccbe-48e5-8a6d-56fa23cfb64c/bzChb2HkM8.json")     # Glowing wave
 
 
+# ---------------------- RESOURCE WARMUP ----------------------
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    """Once per server process: import model modules and build detectors in the background."""
+    from utils import resources
+    t = threading.Thread(target=resources.warmup, name="resource-warmup", daemon=True)
+    t.start()
+    return t
+
+
+if os.environ.get("DEEPSECURE_WARMUP", "0") == "1":
+    start_warmup()
+
+
 # ---------------------- ANIMATED BACKGROUND ----------------------
 def add_bg_animation():
     """Adds a futuristic animated gradient and floating particles background."""
@@ -116,8 +143,13 @@ def add_bg_animation():
 # ---------------------- SESSION DEFAULTS ----------------------
 if "auth" not in st.session_state:
     st.session_state.auth = {"logged_in": False, "user": None}
+elif st.session_state.auth["logged_in"] and verify_session(st.session_state.auth["user"].get("token")) is None:
+    # session token expired (or server restarted): log out instead of re-checking the password
+    st.session_state.auth = {"logged_in": False, "user": None}
 if "page" not in st.session_state:
     st.session_state.page = "home"
+if "active_results" not in st.session_state:
+    st.session_state.active_results = {}
 
 
 # ---------------------- HEADER NAVIGATION ----------------------
@@ -173,11 +205,40 @@ def render_header():
 
 
 # ---------------------- SIDEBAR AUTH ----------------------
+# Proxies (comma-separated addresses) whose X-Forwarded-For / X-Real-Ip are
+# believed; without them the headers are client-controlled and ignored.
+TRUSTED_PROXIES = {p.strip() for p in os.environ.get("DEEPSECURE_TRUSTED_PROXIES", "").split(",") if p.strip()}
+
+
+def client_id():
+    """
+    Identity of the connecting client for login throttling: the peer address,
+    or the last X-Forwarded-For hop outside TRUSTED_PROXIES when the peer is one
+    of them. None when the address is unknown (older Streamlit without
+    st.context.ip_address); login_user then applies only the per-email limit.
+    """
+    try:
+        peer = getattr(st.context, "ip_address", None)
+        headers = st.context.headers
+    except Exception:
+        return None
+    if peer and peer in TRUSTED_PROXIES:
+        hops = [h.strip() for h in (headers.get("X-Forwarded-For") or "").split(",") if h.strip()]
+        # our own proxies append to the right; anything left of the first untrusted hop is spoofable
+        for hop in reversed(hops):
+            if hop not in TRUSTED_PROXIES:
+                return hop
+        if headers.get("X-Real-Ip"):
+            return headers.get("X-Real-Ip")
+    return peer or None
+
+
 def auth_sidebar():
     st.sidebar.title("🔑 Account")
     if st.session_state.auth["logged_in"]:
         st.sidebar.success(f"✅ Logged in as {st.session_state.auth['user'].get('full_name','')}")
         if st.sidebar.button("Logout"):
+            logout_session(st.session_state.auth["user"].get("token"))
             st.session_state.auth = {"logged_in": False, "user": None}
             st.rerun()
     else:
@@ -194,7 +255,7 @@ def auth_sidebar():
                     st.sidebar.error(msg)
         else:
             if st.sidebar.button("➡️ Login"):
-                ok, info = authenticate_user(email.strip().lower(), pwd)
+                ok, info = login_user(email.strip().lower(), pwd, client_id=client_id())
                 if ok:
                     st.session_state.auth = {"logged_in": True, "user": info}
                     st.sidebar.success("✅ Logged in.")
@@ -250,6 +311,133 @@ def about_page():
         st.caption("Ensuring biometric trust through deep learning innovation.")
 
 
+# ---------------------- SESSION RESULT CACHE ----------------------
+# Results survive reruns (zoom, paging, mode switches) in a per-session LRU.
+SESSION_CACHE_MB = int(os.environ.get("DEEPSECURE_SESSION_CACHE_MB", "64"))
+
+
+def result_cache():
+    from utils.session_cache import ResultCache
+    if "results" not in st.session_state:
+        st.session_state.results = ResultCache(max_bytes=SESSION_CACHE_MB * 1024 * 1024)
+    return st.session_state.results
+
+
+def remember_result(mode, key, res):
+    """Cache res and pin it as the mode's shown result (older entries make room, never this one)."""
+    cache = result_cache()
+    old = st.session_state.active_results.get(mode)
+    st.session_state.active_results[mode] = key
+    if old is not None and old != key and old not in st.session_state.active_results.values():
+        cache.unpin(old)
+    cache.put(key, res, pinned=True)
+
+
+def log_analysis(mode, media, res):
+    """Queue a fresh result for the persistent history (written in the background)."""
+    from utils.history import get_history, media_digest
+    user = st.session_state.auth.get("user") or {}
+    try:
+        get_history().record(user.get("email"), mode, media_digest(media), res)
+    except Exception as e:
+        logger.warning("analysis not recorded in history: %s", e)
+
+
+def render_history():
+    from utils.history import get_history
+    import datetime
+    user = st.session_state.auth.get("user") or {}
+    with st.expander("🕘 My recent analyses"):
+        rows = get_history().recent(user.get("email"), limit=20)
+        if not rows:
+            st.caption("No analyses yet.")
+            return
+        st.dataframe([{
+            "when": datetime.datetime.fromtimestamp(r["created_at"]).strftime("%Y-%m-%d %H:%M"),
+            "mode": r["mode"],
+            "verdict": r["verdict"],
+            "confidence": round(r["confidence"], 2),
+            "media": r["media_hash"][:12],
+        } for r in rows], use_container_width=True)
+
+
+def shown_result(mode, key):
+    """The last result analyzed in this mode, if it still matches the current inputs and is cached."""
+    if st.session_state.active_results.get(mode) != key:
+        return None
+    return result_cache().get(key)
+
+
+def render_image_result(res):
+    st.success(f"Verdict: **{res['verdict'].upper()}** ({res['confidence']:.2f}%)")
+    if res.get("duplicate_of"):
+        dup = res["duplicate_of"]
+        st.info(f"♻️ Near-duplicate of analysis #{dup['analysis_id']} (distance {dup['distance']:.1f}) — verdict reused.")
+    if res["annotated_image"] is not None:
+        st.image(res["annotated_image"], caption="Detected Faces (Annotated)")
+    st.json({k: v for k, v in res.items() if k != "annotated_image"})
+
+
+# ---------------------- VIDEO RESULT RENDERING ----------------------
+FRAME_PAGE_SIZE = 10
+
+
+def render_frame_row(fi, with_zoom=True):
+    """One Frame Details row: thumbnail, timing/faces and (optionally) a zoom button."""
+    cols = st.columns([1, 4, 2])
+    with cols[0]:
+        st.image(fi["thumbnail"], width=120)
+    with cols[1]:
+        st.write(f"Frame #{fi['index']} — {fi['timestamp']:.2f}s")
+        st.write("Faces: " + (str(fi["faces"]) if fi["faces"] else "None"))
+    with cols[2]:
+        if with_zoom and fi["faces"]:
+            if st.button(f"🔍 Zoom #{fi['index']}", key=f"zoom{fi['index']}"):
+                st.session_state.zoom_frame = fi["index"]
+
+
+def render_video_result(res):
+    from utils.video_model import render_annotated_frame
+    st.success(f"Verdict: **{res['verdict'].upper()}** ({res['confidence']:.2f}%)")
+    if res.get("duplicate_of"):
+        dup = res["duplicate_of"]
+        st.info(f"♻️ Near-duplicate of analysis #{dup['analysis_id']} (distance {dup['distance']:.1f}) — verdict reused.")
+    st.metric("Gait Verification", "✅ PASS" if res["gait_ok"] else "❌ FAIL")
+    st.progress(min(1.0, res["gait_confidence"] / 100.0))
+    gait = res.get("gait")
+    if gait and gait.get("gei_image") is not None:
+        st.image(gait["gei_image"], caption=f"Gait Energy Image ({gait['silhouette_count']} silhouettes)", width=176)
+    if res.get("contact_sheet"):
+        st.image(res["contact_sheet"], caption="Extracted Keyframes", use_column_width=True)
+
+    st.markdown("### 🎞️ Frame Details")
+    frames_info = res["frames_info"]
+    pages = max(1, -(-len(frames_info) // FRAME_PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="frame_page")
+    page_frames = frames_info[(page - 1) * FRAME_PAGE_SIZE:page * FRAME_PAGE_SIZE]
+    for fi in page_frames:
+        render_frame_row(fi)
+
+    zoom = st.session_state.get("zoom_frame")
+    zoomed = next((fi for fi in frames_info if fi["index"] == zoom), None)
+    if zoomed is not None:
+        # full-resolution annotated frame is only rendered for the zoomed row
+        annotated = render_annotated_frame(zoomed)
+        if annotated is None:
+            st.warning("The uploaded video is no longer stored; re-run the analysis to zoom in.")
+        else:
+            st.image(annotated, caption=f"Frame #{zoomed['index']} — {zoomed['timestamp']:.2f}s")
+        if st.button("✖ Close zoom"):
+            st.session_state.zoom_frame = None
+            st.rerun()
+    if res.get("stopped") and res["stopped"] != "duplicate":
+        st.caption(f"⚡ Verdict from {res['frames_used']} scored frames "
+                   f"({res['frames_decoded']} decoded; stopped: {res['stopped']}).")
+    if res.get("windows_resumed"):
+        st.caption(f"Resumed {res['windows_resumed']} of {res['windows']} windows from checkpoints.")
+    st.json({k: v for k, v in res.items() if k not in ["contact_sheet", "frames_info", "gait"]})
+
+
 # ---------------------- DASHBOARD PAGE ----------------------
 def dashboard_page():
     add_bg_animation()
@@ -258,69 +446,162 @@ def dashboard_page():
         st.warning("🔒 Please login (sidebar) to access the dashboard.")
         return
 
+    from utils.image_model import analyze_image, iter_analyze_images
+    from utils.video_model import analyze_video, analyze_long_video
+    from utils.phash import DEFAULT_MAX_DISTANCE
+    from utils.session_cache import upload_key, text_key
+
     st.header("📊 Dashboard — Upload & Analyze")
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
         mode = st.selectbox("🧾 Select Input Type", ["Image", "Video", "Text"])
+        if mode != "Text":
+            dup_dist = st.slider("Near-duplicate threshold (hash bits)", 0, 16, DEFAULT_MAX_DISTANCE,
+                                 help="Uploads within this perceptual-hash distance of a past analysis reuse its verdict. 0 = exact only.")
 
         if mode == "Image":
-            uploaded = st.file_uploader("🖼️ Upload an image", type=["png", "jpg", "jpeg"])
-            if uploaded and st.button("🚀 Analyze Image"):
-                with st.spinner("Analyzing image..."):
-                    if LOTTIE_PROCESS:
-                        st.markdown("<div style='text-align:center;'>", unsafe_allow_html=True)
-                        st_lottie(LOTTIE_PROCESS, height=150, key="proc_img")
-                        st.markdown("</div>", unsafe_allow_html=True)
-                    res = analyze_image(uploaded)
-                st.success(f"Verdict: **{res['verdict'].upper()}** ({res['confidence']:.2f}%)")
-                if res["annotated_image"] is not None:
-                    st.image(res["annotated_image"], caption="Detected Faces (Annotated)")
-                st.json({k: v for k, v in res.items() if k != "annotated_image"})
+            uploaded = st.file_uploader("🖼️ Upload image(s)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
+            if len(uploaded) == 1:
+                key = ("image", upload_key(uploaded[0]), dup_dist)
+                if st.button("🚀 Analyze Image"):
+                    res = result_cache().get(key)
+                    if res is None:
+                        with st.spinner("Analyzing image..."):
+                            if LOTTIE_PROCESS:
+                                st.markdown("<div style='text-align:center;'>", unsafe_allow_html=True)
+                                st_lottie(LOTTIE_PROCESS, height=150, key="proc_img")
+                                st.markdown("</div>", unsafe_allow_html=True)
+                            res = analyze_image(uploaded[0], max_distance=dup_dist)
+                        log_analysis("image", uploaded[0], res)
+                    remember_result("image", key, res)
+                res = shown_result("image", key)
+                if res:
+                    render_image_result(res)
+            elif len(uploaded) > 1:
+                key = ("images", tuple(upload_key(f) for f in uploaded), dup_dist)
+                if st.button(f"🚀 Analyze {len(uploaded)} Images"):
+                    rows = result_cache().get(key)
+                    if rows is None:
+                        rows = [{"file": f.name, "verdict": "⏳", "confidence": None, "faces": None,
+                                 "duplicate_of": None} for f in uploaded]
+                        progress = st.progress(0.0)
+                        table = st.empty()
+                        table.dataframe(rows, use_container_width=True)
+                        for done, (pos, res) in enumerate(iter_analyze_images(uploaded, max_distance=dup_dist),
+                                                          start=1):
+                            if res.get("error"):
+                                rows[pos].update({"verdict": "ERROR", "error": res["error"]})
+                                table.dataframe(rows, use_container_width=True)
+                                progress.progress(done / len(uploaded))
+                                continue
+                            log_analysis("image", uploaded[pos], res)
+                            rows[pos].update({
+                                "verdict": res["verdict"].upper(),
+                                "confidence": round(res["confidence"], 2),
+                                "faces": len(res["faces"]),
+                                "duplicate_of": res["duplicate_of"]["analysis_id"] if res.get("duplicate_of") else None,
+                            })
+                            table.dataframe(rows, use_container_width=True)
+                            progress.progress(done / len(uploaded))
+                        progress.empty()
+                        table.empty()
+                    remember_result("images", key, rows)
+                rows = shown_result("images", key)
+                if rows:
+                    st.dataframe(rows, use_container_width=True)
+                    st.success(f"Analyzed {len(rows)} images.")
 
         elif mode == "Video":
             uploaded = st.file_uploader("🎥 Upload a short video", type=["mp4", "avi"])
             sample_sec = st.slider("Frame Sampling Interval (seconds)", 1, 5, 1)
+            long_mode = st.checkbox("🧱 Long clip mode (windowed, resumable)",
+                                    help="Streams the upload to disk and analyzes it window by window. "
+                                         "An interrupted run resumes from the last finished window.")
+            early_exit = False
+            if long_mode:
+                window_sec = st.slider("Window length (seconds)", 10, 300, 60, step=10)
+            else:
+                window_sec = None
+                early_exit = st.checkbox("⚡ Stop early when the verdict is clear",
+                                         help="Decode frame by frame and stop once the running per-frame score "
+                                              "settles the verdict.")
+                n_segments, detect_workers = 1, 0
+                if not early_exit:
+                    n_segments = st.slider("Parallel decode segments", 1, max(2, runtime.available_cpus()), 1,
+                                           help="Split the clip into time segments decoded by separate processes.")
+                if n_segments == 1 and not early_exit:
+                    detect_workers = st.slider("Detection worker processes", 0, runtime.available_cpus(), 0,
+                                               help="Decode here and detect faces in worker processes that read "
+                                                    "frames from shared memory. 0 = in-process.")
+            key = ("video", upload_key(uploaded), sample_sec, long_mode, window_sec, early_exit,
+                   dup_dist) if uploaded else None
             if uploaded and st.button("🚀 Analyze Video"):
-                with st.spinner("Analyzing video... this may take a few seconds"):
-                    if LOTTIE_PROCESS:
-                        st.markdown("<div style='text-align:center;'>", unsafe_allow_html=True)
-                        st_lottie(LOTTIE_PROCESS, height=150, key="proc_vid")
-                        st.markdown("</div>", unsafe_allow_html=True)
-                    uploaded.seek(0)
-                    res = analyze_video(uploaded, sample_seconds=sample_sec)
-                st.success(f"Verdict: **{res['verdict'].upper()}** ({res['confidence']:.2f}%)")
-                st.metric("Gait Verification", "✅ PASS" if res["gait_ok"] else "❌ FAIL")
-                st.progress(min(1.0, res["gait_confidence"] / 100.0))
-                if res.get("contact_sheet"):
-                    st.image(res["contact_sheet"], caption="Extracted Keyframes", use_column_width=True)
-                st.markdown("### 🎞️ Frame Details")
-                for fi in res["frames_info"]:
-                    cols = st.columns([1, 4, 2])
-                    with cols[0]:
-                        if fi["annotated_frame"]:
-                            st.image(fi["annotated_frame"], width=120)
-                    with cols[1]:
-                        st.write(f"Frame #{fi['index']} — {fi['timestamp']:.2f}s")
-                        st.write("Faces: " + (str(fi["faces"]) if fi["faces"] else "None"))
-                    with cols[2]:
-                        if fi["faces"]:
-                            st.button(f"🔍 Zoom #{fi['index']}", key=f"zoom{fi['index']}")
-                st.json({k: v for k, v in res.items() if k not in ["contact_sheet", "frames_info"]})
+                res = result_cache().get(key)
+                if res is None:
+                    status = st.empty()
+                    live_slot = st.empty()
+                    live = live_slot.container()
+                    shown = []
+
+                    def on_frame(fi, done, total):
+                        unit = "windows" if long_mode else "sampled frames"
+                        status.caption(f"Processed {done}/{total} {unit}")
+                        if len(shown) < FRAME_PAGE_SIZE:
+                            shown.append(fi["index"])
+                            with live:
+                                render_frame_row(fi, with_zoom=False)
+
+                    with st.spinner("Analyzing video... this may take a few seconds"):
+                        if LOTTIE_PROCESS:
+                            st.markdown("<div style='text-align:center;'>", unsafe_allow_html=True)
+                            st_lottie(LOTTIE_PROCESS, height=150, key="proc_vid")
+                            st.markdown("</div>", unsafe_allow_html=True)
+                        uploaded.seek(0)
+                        try:
+                            if long_mode:
+                                res = analyze_long_video(uploaded, sample_seconds=sample_sec,
+                                                         window_seconds=window_sec, progress_callback=on_frame)
+                            else:
+                                res = analyze_video(uploaded, sample_seconds=sample_sec, max_distance=dup_dist,
+                                                    progress_callback=on_frame, segments=n_segments,
+                                                    detect_workers=detect_workers, early_exit=early_exit)
+                        except ValueError:
+                            res = None  # not a video OpenCV can decode
+                    status.empty()
+                    live_slot.empty()
+                    if res is None:
+                        st.error("Could not open this video.")
+                        st.stop()
+                    log_analysis("video", uploaded, res)
+                remember_result("video", key, res)
+                st.session_state.frame_page = 1
+                st.session_state.zoom_frame = None
+            res = shown_result("video", key) if uploaded else None
+            if res:
+                # paging / zoom reruns re-render from the session cache
+                render_video_result(res)
 
         else:
             txt = st.text_area("💬 Enter text to analyze (for similarity / sentiment)", height=160)
+            key = ("text", text_key(txt))
             if st.button("🚀 Analyze Text"):
                 if not txt.strip():
                     st.error("Enter some text.")
                 else:
-                    with st.spinner("Running text analysis..."):
-                        res = analyze_text(txt)
-                    st.success(f"Sentiment: {res['sentiment']}")
-                    st.metric("Confidence", f"{res['confidence']:.2f}%")
-                    st.progress(min(1.0, res["similarity"] / 100.0))
-                    st.json(res)
+                    res = result_cache().get(key)
+                    if res is None:
+                        with st.spinner("Running text analysis..."):
+                            res = analyze_text(txt)
+                        log_analysis("text", txt, res)
+                    remember_result("text", key, res)
+            res = shown_result("text", key)
+            if res:
+                st.success(f"Sentiment: {res['sentiment']}")
+                st.metric("Confidence", f"{res['confidence']:.2f}%")
+                st.progress(min(1.0, res["similarity"] / 100.0))
+                st.json(res)
 
     with col2:
         st.markdown("### ⚙️ Quick Help & Info")
@@ -328,6 +609,15 @@ def dashboard_page():
         st.markdown("- 🎥 **Video:** Gait + deepfake hybrid verification.")
         st.markdown("- 💬 **Text:** Sentiment & similarity analyzer.")
         st.info("Replace model stubs in `utils/image_model.py` & `utils/video_model.py` with your AI inference code.")
+        stats = result_cache().stats()
+        st.caption(f"🗄️ Session cache: {stats['entries']} results, "
+                   f"{stats['bytes'] / 2**20:.1f} / {stats['max_bytes'] / 2**20:.0f} MB")
+        render_history()
+        rt = runtime.report()
+        if "cv2_threads" in rt:
+            tuned = " (autotuned)" if "autotune" in rt else ""
+            st.caption(f"🧮 {rt['cpus']} CPUs · detection pool {rt['detect_pool']} × "
+                       f"{rt['cv2_threads']} OpenCV thread(s){tuned} · single calls {rt['cv2_default_threads']}")
 
     # Footer micro animation
     if LOTTIE_FOOTER:
@@ -0,0 +1,158 @@
+# benchmarks/bench_api_load.py
+"""
+Closed-loop load test for api.py: `concurrency` keep-alive clients send
+requests back to back for `duration` seconds; reports throughput, latency
+percentiles and how many requests were refused with 429.
+
+    python benchmarks/bench_api_load.py --endpoint text [--url http://127.0.0.1:8502]
+    python benchmarks/bench_api_load.py --endpoint image --file face.jpg -c 16 -d 30
+    python benchmarks/bench_api_load.py --endpoint text --inprocess --workers 4 --queue 8
+
+--inprocess starts the server in this process on a free port (no separate
+terminal needed); otherwise --url must point at a running `python api.py`.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ApiClient:
+    """Minimal keep-alive client for api.py (one connection, reused across requests)."""
+
+    def __init__(self, url, timeout=120):
+        u = urlsplit(url)
+        self.host, self.port = u.hostname, u.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def _request(self, method, path, body=None, headers=None):
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                resp = self.conn.getresponse()
+                data = resp.read()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                # server closed an idle keep-alive connection: reconnect once
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if resp.getheader("Connection", "").lower() == "close":
+                self.close()
+            return resp.status, json.loads(data or b"{}")
+
+    def health(self):
+        return self._request("GET", "/healthz")
+
+    def text(self, text):
+        return self._request("POST", "/v1/text", json.dumps({"text": text}).encode("utf-8"),
+                             {"Content-Type": "application/json"})
+
+    def upload(self, endpoint, filename, data, query=""):
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n").encode("utf-8") + data + \
+               f"\r\n--{boundary}--\r\n".encode("utf-8")
+        return self._request("POST", f"/v1/{endpoint}{query}", body,
+                             {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def start_inprocess(workers, queue):
+    import asyncio
+    from api import InferenceServer
+    ready = threading.Event()
+    port = []
+
+    def run():
+        srv = InferenceServer(workers=workers, queue=queue)
+        asyncio.run(srv.serve("127.0.0.1", 0, ready=lambda p: (port.append(p), ready.set())))
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait(10)
+    return f"http://127.0.0.1:{port[0]}"
+
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return float("nan")
+    k = min(len(sorted_vals) - 1, max(0, int(round(q / 100 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8502")
+    ap.add_argument("--endpoint", choices=["text", "image", "video"], default="text")
+    ap.add_argument("--file", help="media file for image / video endpoints")
+    ap.add_argument("-c", "--concurrency", type=int, default=8)
+    ap.add_argument("-d", "--duration", type=float, default=10.0)
+    ap.add_argument("--inprocess", action="store_true")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--queue", type=int, default=None)
+    args = ap.parse_args()
+
+    if args.endpoint != "text" and not args.file:
+        ap.error("--file is required for image / video")
+    payload = open(args.file, "rb").read() if args.file else None
+    url = start_inprocess(args.workers, args.queue) if args.inprocess else args.url
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def client_loop(n):
+        client = ApiClient(url)
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                if args.endpoint == "text":
+                    status, _ = client.text(f"load test message {n}")
+                else:
+                    status, _ = client.upload(args.endpoint, os.path.basename(args.file), payload)
+            except Exception:
+                status = "error"
+            dt = time.perf_counter() - t0
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(dt)
+            if status == 429:
+                time.sleep(0.05)  # honour back-pressure instead of hammering the accept loop
+        client.close()
+
+    t_start = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+
+    latencies.sort()
+    ok = len(latencies)
+    print(f"{args.endpoint} x{args.concurrency} clients for {elapsed:.1f}s -> {url}")
+    print(f"  responses: {dict(sorted(statuses.items(), key=str))}")
+    print(f"  throughput: {ok / elapsed:.2f} req/s (200 only)")
+    for q in (50, 95, 99):
+        print(f"  p{q}: {percentile(latencies, q) * 1000:.1f} ms")
+    status, health = ApiClient(url).health()
+    print(f"  server: {health}")
+
+
+if __name__ == "__main__":
+    main()
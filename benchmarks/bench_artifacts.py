@@ -0,0 +1,47 @@
+# benchmarks/bench_artifacts.py
+"""
+Per-crop cost of utils.artifacts.crop_features, batched vs. one crop at a time.
+
+    python benchmarks/bench_artifacts.py [--size 128] [--batches 1 16 64 256]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from utils.artifacts import crop_features
+from utils.crops import FEATURE_CROP
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size", type=int, default=FEATURE_CROP)
+    ap.add_argument("--batches", type=int, nargs="+", default=[1, 16, 64, 256])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"crop size {args.size}x{args.size}")
+    print(f"{'batch':>6} {'batched us/crop':>16} {'looped us/crop':>15} {'speedup':>8}")
+    for n in args.batches:
+        crops = rng.integers(0, 256, (n, args.size, args.size, 3), dtype=np.uint8)
+        crop_features(crops[:1])  # build the cached masks outside the timing
+        batched = best_of(lambda: crop_features(crops), args.repeat) / n
+        looped = best_of(lambda: [crop_features(crops[i:i + 1]) for i in range(n)], args.repeat) / n
+        print(f"{n:>6} {batched * 1e6:>16.1f} {looped * 1e6:>15.1f} {looped / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_image_decode.py
+"""
+Compare the old analyze_image decode path (full-size PIL -> RGB -> BGR copy)
+against utils.processing.decode_image on a large synthetic JPEG.
+
+Each path runs in a fresh subprocess so peak RSS is not polluted by the other.
+The test JPEG is written by a subprocess too: Linux children start with the
+parent's peak RSS (kept across fork + exec), so the parent stays small.
+
+    python benchmarks/bench_image_decode.py [--megapixels 24] [--repeat 5]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_jpeg(megapixels):
+    import numpy as np
+    from PIL import Image
+    h = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    w = int(h * 4 / 3)
+    rng = np.random.default_rng(0)
+    # smooth gradient + noise compresses like a photo, unlike pure noise
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = ((xx / w * 255 + yy / h * 128) % 256).astype(np.uint8)
+    img = np.stack([base, base[::-1], np.roll(base, w // 3, axis=1)], axis=2)
+    img = (img + rng.integers(0, 16, img.shape, dtype=np.uint8)).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def legacy_decode(data):
+    import numpy as np
+    from PIL import Image
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    return np.array(img)[:, :, ::-1].copy()
+
+
+def fast_decode(data):
+    from utils.processing import decode_image
+    frame, _ = decode_image(io.BytesIO(data))
+    return frame
+
+
+def run_child(path, jpeg_path, repeat):
+    with open(jpeg_path, "rb") as f:
+        data = f.read()
+    fn = legacy_decode if path == "legacy" else fast_decode
+    fn(data)  # warm imports
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        frame = fn(data)
+        times.append(time.perf_counter() - t0)
+        del frame
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "path": path,
+        "best_ms": min(times) * 1000,
+        "median_ms": sorted(times)[len(times) // 2] * 1000,
+        "peak_rss_mb": rss_after / 1024,
+        "peak_rss_growth_mb": (rss_after - rss_before) / 1024,
+    }))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--megapixels", type=float, default=24)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--child", choices=["legacy", "fast", "make"])
+    ap.add_argument("--jpeg")
+    args = ap.parse_args()
+
+    if args.child == "make":
+        with open(args.jpeg, "wb") as f:
+            f.write(make_jpeg(args.megapixels))
+        return
+    if args.child:
+        run_child(args.child, args.jpeg, args.repeat)
+        return
+
+    jpeg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_bench.jpg")
+    subprocess.run([sys.executable, __file__, "--child", "make", "--jpeg", jpeg_path,
+                    "--megapixels", str(args.megapixels)], check=True)
+    try:
+        print(f"{'path':<8} {'best ms':>9} {'median ms':>10} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+        for path in ("legacy", "fast"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", path, "--jpeg", jpeg_path, "--repeat", str(args.repeat)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{r['path']:<8} {r['best_ms']:>9.1f} {r['median_ms']:>10.1f} {r['peak_rss_mb']:>12.1f} "
+                  f"{r['peak_rss_growth_mb']:>14.1f}")
+    finally:
+        os.unlink(jpeg_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_import_time.py
+"""
+Import-time profile of the app's modules (python -X importtime, fresh
+interpreter per module), plus a check that the modules app.py imports at
+the top level do not drag in the heavy stack.
+
+    python benchmarks/bench_import_time.py [--repeat 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "utils.sql_auth",
+    "utils.text_model",
+    "utils.resources",
+    "utils.processing",
+    "utils.phash",
+    "utils.image_model",
+    "utils.video_model",
+    "streamlit",
+]
+# what app.py imports before any page is chosen; none of HEAVY may appear
+APP_TOP_LEVEL = ["streamlit", "streamlit.components.v1", "utils.text_model", "utils.sql_auth",
+                 "utils.runtime", "utils.ratelimit"]
+HEAVY = ["cv2", "numpy", "PIL", "requests", "streamlit_lottie", "tensorflow", "torch"]
+
+
+def import_time_ms(module):
+    """Cumulative import time of module in a fresh interpreter, or None if it can't be imported."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    return None
+
+
+def heavy_modules_loaded(modules):
+    code = (
+        "import importlib, sys\n"
+        f"for m in {modules!r}:\n"
+        "    try: importlib.import_module(m)\n"
+        "    except ImportError: pass\n"
+        f"print(','.join(h for h in {HEAVY!r} if h in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True).stdout
+    return [m for m in out.strip().split(",") if m]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'module':<22} {'best cumulative ms':>20}")
+    for module in MODULES:
+        runs = [t for t in (import_time_ms(module) for _ in range(args.repeat)) if t is not None]
+        shown = f"{min(runs):.1f}" if runs else "not importable"
+        print(f"{module:<22} {shown:>20}")
+
+    leaked = heavy_modules_loaded(APP_TOP_LEVEL)
+    if leaked:
+        print(f"\nREGRESSION: app.py top-level imports load heavy modules: {', '.join(leaked)}")
+        sys.exit(1)
+    print("\napp.py top-level imports are free of heavy modules.")
+
+
+if __name__ == "__main__":
+    main()
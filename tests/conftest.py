@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests import the app's modules the way app.py does (from utils import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,153 @@
+import io
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import api
+from benchmarks.bench_api_load import ApiClient, start_inprocess
+
+ASSETS = Path(__file__).resolve().parent.parent / "assets"
+VIDEO = ASSETS / "262696_small.mp4"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def workdir(tmp_path_factory):
+    # uploads, checkpoints and the hash index live under relative paths
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("api"))
+    yield
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope="module")
+def url():
+    return start_inprocess(workers=2, queue=2)
+
+
+@pytest.fixture
+def client(url):
+    c = ApiClient(url)
+    yield c
+    c.close()
+
+
+def png_bytes(seed=0):
+    rng = np.random.default_rng(seed)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (96, 128, 3), dtype=np.uint8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def raw_status(url, head, body=b""):
+    """Send a hand-written request (headers the client library would fix up) and return the status."""
+    u = urlsplit(url)
+    with socket.create_connection((u.hostname, u.port), timeout=30) as s:
+        s.sendall(head.encode("latin-1") + b"\r\n\r\n" + body)
+        return int(s.makefile("rb").readline().split()[1])
+
+
+def test_image(client):
+    status, res = client.upload("image", "noise.png", png_bytes())
+    assert status == 200, res
+    assert res["verdict"] in ("deepfake", "authentic")
+    assert res["image_size"] == [128, 96]
+
+
+def test_image_undecodable(client):
+    status, res = client.upload("image", "noise.png", b"not an image at all")
+    assert status == 400
+    assert res["error"] == "could not decode this image"
+
+
+def test_video(client):
+    status, res = client.upload("video", "clip.mp4", VIDEO.read_bytes(), "?sample_seconds=2")
+    assert status == 200, res
+    assert res["verdict"] in ("deepfake", "authentic")
+    assert res["frames_info"]
+    assert all("thumbnail" not in fi and "source" not in fi for fi in res["frames_info"])
+
+
+def test_text(client):
+    status, res = client.text("Breaking: scientists confirm the moon is made of cheese.")
+    assert status == 200, res
+    assert res["sentiment"] in ("Positive", "Neutral", "Negative")
+
+
+def test_missing_length(url):
+    assert raw_status(url, "POST /v1/text HTTP/1.1\r\nHost: x\r\nContent-Type: application/json") == 411
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1e3", "²"])
+def test_invalid_length(url, length):
+    assert raw_status(url, f"POST /v1/text HTTP/1.1\r\nHost: x\r\nContent-Length: {length}") == 400
+
+
+def test_too_large(url):
+    length = api.MAX_UPLOAD_MB * 1024 * 1024 + 1
+    head = f"POST /v1/video HTTP/1.1\r\nHost: x\r\nContent-Type: multipart/form-data; boundary=b\r\nContent-Length: {length}"
+    assert raw_status(url, head) == 413
+
+
+def test_unsupported_type(url):
+    body = b"hello"
+    head = f"POST /v1/text HTTP/1.1\r\nHost: x\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}"
+    assert raw_status(url, head, body) == 415
+
+
+def test_busy():
+    url = start_inprocess(workers=1, queue=0)
+    slow = ApiClient(url)
+    done = []
+    t = threading.Thread(target=lambda: done.append(slow.upload("video", "clip.mp4", VIDEO.read_bytes())))
+    t.start()
+    probe = ApiClient(url)
+    try:
+        deadline = time.time() + 30
+        while probe.health()[1]["admitted"] < 1:
+            assert time.time() < deadline, "video request was never admitted"
+            time.sleep(0.01)
+        status, res = probe.text("anything")
+        assert status == 429
+        t.join(120)
+        assert done and done[0][0] == 200
+        assert probe.health()[1]["rejected"] == 1
+    finally:
+        slow.close()
+        probe.close()
+
+
+def test_video_long(client):
+    status, res = client.upload("video", "clip.mp4", VIDEO.read_bytes(), "?long=1&sample_seconds=1&window_seconds=2")
+    assert status == 200, res
+    assert res["windows"] >= 1
+    assert "source" not in res
+    status, again = client.upload("video", "clip.mp4", VIDEO.read_bytes(), "?long=1&sample_seconds=1&window_seconds=2")
+    assert status == 200
+    assert again["windows_resumed"] == again["windows"]
+    assert [fi["index"] for fi in again["frames_info"]] == [fi["index"] for fi in res["frames_info"]]
+
+
+def test_video_long_rejects_other_modes(client):
+    status, res = client.upload("video", "clip.mp4", VIDEO.read_bytes(), "?long=1&segments=2")
+    assert status == 400
+    assert "segments" in res["error"]
+
+
+def test_video_undecodable(client):
+    status, res = client.upload("video", "clip.mp4", b"\x00" * 4096)
+    assert status == 400
+    assert res["error"] == "could not decode this video"
+
+
+@pytest.mark.parametrize("query", ["?early_exit=1&segments=2", "?early_exit=1&detect_workers=1",
+                                   "?max_frames=5", "?time_budget=2", "?long=1&early_exit=1"])
+def test_video_incompatible_options(client, query):
+    status, res = client.upload("video", "clip.mp4", VIDEO.read_bytes(), query)
+    assert status == 400, res
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.dataset import INDEX_FILE, DatasetWriter, MemmapDataset, PrefetchLoader
+
+FIELDS = {"x": ((3,), "float32"), "y": ((), "int64")}
+
+
+def sample(i):
+    return {"x": np.full(3, i, np.float32), "y": np.int64(i)}
+
+
+def write(root, n, shard_size=4, batched=False):
+    with DatasetWriter(root, FIELDS, shard_size=shard_size) as w:
+        if batched:
+            w.add_batch({"x": np.repeat(np.arange(n, dtype=np.float32)[:, None], 3, 1), "y": np.arange(n)},
+                        [{"i": i} for i in range(n)])
+        else:
+            for i in range(n):
+                w.add(sample(i), {"i": i})
+    return MemmapDataset(root)
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_shards_roll_over_and_last_is_trimmed(tmp_path, batched):
+    ds = write(tmp_path, 10, batched=batched)
+    assert len(ds) == 10
+    assert [len(s["y"]) for s in ds._shards] == [4, 4, 2]
+    # the partial last shard is shrunk on disk, not left at shard_size rows
+    assert np.load(tmp_path / "y-00002.npy").shape == (2,)
+    assert [int(ds[i]["y"]) for i in range(10)] == list(range(10))
+    assert ds.meta(7) == {"i": 7}
+
+
+def test_exact_multiple_of_shard_size(tmp_path):
+    ds = write(tmp_path, 8)
+    assert [len(s["y"]) for s in ds._shards] == [4, 4]
+
+
+def test_batch_keeps_requested_order_across_shards(tmp_path):
+    ds = write(tmp_path, 10)
+    idx = [9, 0, 5, 4, 3, 8, 1]
+    out = ds.batch(idx)
+    assert out["y"].tolist() == idx
+    assert out["x"][:, 0].tolist() == idx
+    assert list(ds.batch(idx, fields=["y"])) == ["y"]
+    with pytest.raises(IndexError):
+        ds.batch([10])
+
+
+@pytest.mark.parametrize("drop_last,sizes", [(False, [4, 4, 2]), (True, [4, 4])])
+def test_prefetch_loader(tmp_path, drop_last, sizes):
+    ds = write(tmp_path, 10)
+    loader = PrefetchLoader(ds, batch_size=4, shuffle=False, drop_last=drop_last, workers=2, prefetch=1)
+    batches = list(loader)
+    assert len(loader) == len(sizes)
+    assert [len(b["y"]) for b in batches] == sizes
+    assert np.concatenate([b["y"] for b in batches]).tolist() == list(range(sum(sizes)))
+
+
+def test_prefetch_loader_shuffles_each_epoch(tmp_path):
+    ds = write(tmp_path, 10)
+    loader = PrefetchLoader(ds, batch_size=3, shuffle=True, seed=0)
+    epochs = [np.concatenate([b["y"] for b in loader]).tolist() for _ in range(2)]
+    assert all(sorted(e) == list(range(10)) for e in epochs)
+    assert epochs[0] != epochs[1]
+
+
+def test_failed_build_writes_no_index(tmp_path):
+    with pytest.raises(RuntimeError):
+        with DatasetWriter(tmp_path, FIELDS, shard_size=4) as w:
+            for i in range(6):
+                w.add(sample(i))
+            raise RuntimeError("extraction failed")
+    assert not (tmp_path / INDEX_FILE).exists()
+    with pytest.raises(FileNotFoundError):
+        MemmapDataset(tmp_path)
+    # the directory can be rebuilt from scratch
+    assert len(write(tmp_path, 3)) == 3
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from utils import ingest, video_model
+
+VIDEO = Path(__file__).resolve().parent.parent / "assets" / "262696_small.mp4"
+LONG = {"sample_seconds": 1, "window_seconds": 1, "silhouettes": False}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # uploads and checkpoints live under relative paths
+    monkeypatch.chdir(tmp_path)
+
+
+def analyze_long(**kwargs):
+    with open(VIDEO, "rb") as f:
+        return video_model.analyze_long_video(f, **LONG, **kwargs)
+
+
+def checkpoints():
+    return sorted(ingest.CHECKPOINT_DIR.rglob("window_*.json"))
+
+
+def test_resume_after_interruption(monkeypatch):
+    full = analyze_long(resume=False)
+    assert full["windows"] == 5
+    for path in checkpoints():
+        path.unlink()
+
+    analyze_window = video_model._analyze_window
+
+    def crash_in_window_3(cap, window, *args):
+        if window == 3:
+            raise KeyboardInterrupt("stopped")
+        return analyze_window(cap, window, *args)
+
+    monkeypatch.setattr(video_model, "_analyze_window", crash_in_window_3)
+    with pytest.raises(KeyboardInterrupt):
+        analyze_long()
+    assert len(checkpoints()) == 3
+
+    monkeypatch.setattr(video_model, "_analyze_window", analyze_window)
+    res = analyze_long()
+    assert res["windows_resumed"] == 3
+    assert res["windows"] == full["windows"]
+    assert [fi["index"] for fi in res["frames_info"]] == [fi["index"] for fi in full["frames_info"]]
+
+
+def test_corrupt_checkpoint_is_recomputed():
+    first = analyze_long()
+    assert first["windows_resumed"] == 0
+    broken = checkpoints()[2]
+    broken.write_text('{"window": 2, "fra', encoding="utf-8")
+
+    res = analyze_long()
+    assert res["windows_resumed"] == first["windows"] - 1
+    assert [fi["index"] for fi in res["frames_info"]] == [fi["index"] for fi in first["frames_info"]]
+    assert json.loads(broken.read_text(encoding="utf-8"))["window"] == 2
+
+
+def age(path, hours):
+    t = time.time() - hours * 3600
+    os.utime(path, (t, t))
+
+
+def test_prune_retention():
+    ingest.UPLOAD_DIR.mkdir(parents=True)
+    old, fresh = ingest.UPLOAD_DIR / "old.mp4", ingest.UPLOAD_DIR / "fresh.mp4"
+    stale_part, live_part = ingest.UPLOAD_DIR / "a.part", ingest.UPLOAD_DIR / "b.part"
+    for p in (old, fresh, stale_part, live_part):
+        p.write_bytes(b"x")
+    age(old, 30)
+    age(stale_part, 2)
+    age(live_part, 0.5)
+
+    old_ckpt = ingest.checkpoint_dir("old", {"window": 60})
+    used_ckpt = ingest.checkpoint_dir("used", {"window": 60})
+    ingest.save_checkpoint(old_ckpt, 0, {})
+    ingest.save_checkpoint(used_ckpt, 0, {})
+    for p in (old_ckpt / "window_00000.json", old_ckpt, old_ckpt.parent):
+        age(p, 30)
+    # an old directory with one recently written window is still in use
+    for p in (used_ckpt, used_ckpt.parent):
+        age(p, 30)
+
+    assert ingest.prune(retention_hours=24) == (2, 1)
+    assert sorted(p.name for p in ingest.UPLOAD_DIR.iterdir()) == ["b.part", "fresh.mp4"]
+    assert [p.name for p in ingest.CHECKPOINT_DIR.iterdir()] == ["used"]
+
+
+def test_reupload_restarts_retention():
+    with open(VIDEO, "rb") as f:
+        path, digest = ingest.save_upload(f)
+    ingest.save_checkpoint(ingest.checkpoint_dir(digest, {"window": 60}), 0, {})
+    for p in [path, *(ingest.CHECKPOINT_DIR / digest).rglob("*"), ingest.CHECKPOINT_DIR / digest]:
+        age(p, 30)
+    with open(VIDEO, "rb") as f:
+        assert ingest.save_upload(f) == (path, digest)
+    assert ingest.prune(retention_hours=24) == (0, 0)
+    assert path.exists()
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from utils.phash import BKTree, PerceptualHashIndex, hamming
+
+
+def brute_force(entries, h, max_distance):
+    return sorted((hamming(h, e), item) for e, item in entries if hamming(h, e) <= max_distance)
+
+
+def test_empty_tree():
+    tree = BKTree()
+    assert len(tree) == 0
+    assert tree.search(0, 64) == []
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 8, 20])
+def test_search_matches_brute_force(max_distance):
+    rng = random.Random(max_distance)
+    base = [rng.getrandbits(64) for _ in range(20)]
+    # clusters of near-duplicates around each base hash, plus exact duplicates
+    entries = []
+    for b in base:
+        for _ in range(10):
+            flips = rng.sample(range(64), rng.randint(0, 12))
+            entries.append(b ^ sum(1 << f for f in flips))
+        entries.append(b)
+    entries = [(h, i) for i, h in enumerate(entries)]
+    tree = BKTree()
+    for h, item in entries:
+        tree.add(h, item)
+    assert len(tree) == len(entries)
+
+    for q in base + [rng.getrandbits(64) for _ in range(10)]:
+        got = tree.search(q, max_distance)
+        assert sorted(got) == brute_force(entries, q, max_distance)
+        assert [d for d, _ in got] == sorted(d for d, _ in got)  # closest first
+
+
+def test_index_lookup_images_and_videos(tmp_path):
+    index = PerceptualHashIndex(db_path=tmp_path / "idx.db")
+    img = index.add("image", [0x0F0F0F0F0F0F0F0F], {"verdict": "authentic"})
+    sig = [0x1111, 0x2222, 0x3333]
+    vid = index.add("video", sig, {"verdict": "deepfake"})
+
+    hit = index.lookup("image", [0x0F0F0F0F0F0F0F0F ^ 0b111])
+    assert hit["analysis_id"] == img and hit["distance"] == 3
+    assert index.lookup("image", [~0x0F0F0F0F0F0F0F0F & (2**64 - 1)]) is None
+
+    # video distance is the mean over aligned keyframes
+    hit = index.lookup("video", [0x1111 ^ 0b1, 0x2222, 0x3333 ^ 0b11])
+    assert hit["analysis_id"] == vid and hit["distance"] == pytest.approx(1.0)
+    assert index.lookup("video", sig[:2]) is None  # different keyframe count
+
+    # a fresh instance rebuilds the trees from SQLite
+    again = PerceptualHashIndex(db_path=tmp_path / "idx.db")
+    assert again.lookup("video", sig)["result"] == {"verdict": "deepfake"}
@@ -0,0 +1,113 @@
+import pytest
+
+from utils.ratelimit import SlidingWindowLimiter, SQLiteSlidingWindowLimiter, TTLCache
+
+
+class Clock:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_limiter(request, tmp_path):
+    def make(limit, window, clock):
+        if request.param == "memory":
+            return SlidingWindowLimiter(limit, window, clock=clock)
+        lim = SQLiteSlidingWindowLimiter(limit, window, tmp_path / "rl.db")
+        lim._clock = clock
+        return lim
+    return make
+
+
+def test_hit_counts_up_to_limit(make_limiter):
+    clock = Clock()
+    lim = make_limiter(3, 60, clock)
+    assert [lim.hit("k") for _ in range(4)] == [True, True, True, False]
+    assert lim.hit("other")
+
+
+def test_previous_window_decays(make_limiter):
+    clock = Clock(1000.0)  # window [960, 1020)
+    lim = make_limiter(4, 60, clock)
+    for _ in range(4):
+        lim.hit("k")
+    # a quarter into the next window the previous 4 hits still weigh 3
+    clock.t = 1035.0
+    assert lim.hit("k")
+    assert not lim.hit("k")
+
+
+def test_rollover_skipping_a_window_forgets_counts(make_limiter):
+    clock = Clock(1000.0)
+    lim = make_limiter(2, 60, clock)
+    lim.hit("k")
+    lim.hit("k")
+    clock.t = 1000.0 + 120
+    assert lim.retry_after("k") == 0.0
+    assert lim.hit("k") and lim.hit("k")
+
+
+def test_retry_after_when_current_window_is_full(make_limiter):
+    clock = Clock(960.0)
+    lim = make_limiter(3, 60, clock)
+    for _ in range(6):
+        lim.hit("k")  # 6 counted, the last 3 rejected
+    # after rollover 6 * (1 - x / 60) < 3 once x > 30: 960 + 60 + 30 - 960
+    wait = lim.retry_after("k")
+    assert wait == pytest.approx(90.0)
+    clock.t = 960.0 + wait - 0.01
+    assert lim.retry_after("k") > 0
+    clock.t = 960.0 + wait + 0.01
+    assert lim.retry_after("k") == 0.0
+
+
+def test_retry_after_while_previous_window_decays(make_limiter):
+    clock = Clock(1000.0)  # window [960, 1020)
+    lim = make_limiter(4, 60, clock)
+    for _ in range(4):
+        lim.hit("k")
+    clock.t = 1020.0
+    lim.hit("k")
+    lim.hit("k")
+    # 4 * (1 - x / 60) + 2 < 4 once x > 30
+    assert lim.retry_after("k") == pytest.approx(30.0)
+    clock.t = 1020.0 + 30.01
+    assert lim.retry_after("k") == 0.0
+    assert lim.hit("k")
+
+
+def test_release_gives_back_a_hit(make_limiter):
+    clock = Clock()
+    lim = make_limiter(2, 60, clock)
+    lim.hit("k")
+    lim.hit("k")
+    lim.release("k")
+    assert lim.hit("k")
+    assert not lim.hit("k")
+    lim.release("missing")  # no bucket: nothing to do
+
+
+def test_stale_keys_expire_and_table_is_bounded():
+    clock = Clock()
+    lim = SlidingWindowLimiter(5, 10, max_keys=3, clock=clock)
+    for k in "abcd":
+        lim.hit(k)
+    assert len(lim) == 3
+    clock.t += 25
+    lim.hit("e")
+    assert len(lim) == 1
+
+
+def test_ttl_cache_expiry_and_refresh():
+    clock = Clock()
+    cache = TTLCache(10, clock=clock)
+    cache.set("a", 1)
+    clock.t += 8
+    assert cache.get("a") == 1  # refreshed to expire at +18
+    clock.t += 8
+    assert cache.get("a") == 1
+    clock.t += 11
+    assert cache.get("a") is None
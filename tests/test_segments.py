@@ -0,0 +1,114 @@
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+import pytest
+
+from utils import resources, segments
+from utils.phash import phash
+from utils.processing import extract_frames_at
+
+FPS = 25
+TOTAL = 1003  # not a multiple of the sampling interval or of the segment count
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    """Synthetic MJPG clip: every frame is a keyframe, so seeks land exactly."""
+    path = tmp_path_factory.mktemp("clip") / "clip.avi"
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    rng = np.random.default_rng(0)
+    for i in range(TOTAL):
+        frame = rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)
+        cv2.putText(frame, str(i), (2, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        out.write(frame)
+    out.release()
+    return path
+
+
+@pytest.mark.parametrize("total,n,interval", [(TOTAL, 4, 25), (TOTAL, 4, 7), (10, 4, 25), (25, 3, 25),
+                                              (1000, 16, 1), (TOTAL, 1, 25)])
+def test_plan_covers_the_sampling_grid(total, n, interval):
+    plan = segments.plan_segments(total, n, interval)
+    assert 1 <= len(plan) <= n
+    assert plan[0][0] == 0 and plan[-1][1] == sys.maxsize
+    for (start, end), (next_start, _) in zip(plan, plan[1:]):
+        assert start % interval == 0 and end == next_start and start < end
+    assert plan[-1][0] < total
+
+
+def test_plan_short_clip_is_one_segment():
+    # fewer frames than one sampling interval: a single sampled frame
+    assert segments.plan_segments(10, 4, 25) == [(0, sys.maxsize)]
+
+
+def test_plan_unknown_frame_count():
+    assert segments.plan_segments(0, 4, 25) == [(0, sys.maxsize)]
+
+
+def test_segments_match_sequential_decode(clip):
+    records, used, _ = segments.analyze_segments(clip, sample_seconds=1, n_segments=4)
+    frames = extract_frames_at(clip, fps_sample=1)
+    assert used == 4
+    assert [r["index"] for r in records] == [idx for idx, _, _ in frames]
+    assert [r["phash"] for r in records] == [phash(f) for _, _, f in frames]
+
+
+def test_segments_unknown_frame_count(clip, monkeypatch):
+    monkeypatch.setattr(segments, "video_meta", lambda cap: (FPS, 0))
+    records, used, _ = segments.analyze_segments(clip, sample_seconds=1, n_segments=4)
+    assert used == 1
+    assert [r["index"] for r in records] == list(range(0, TOTAL, FPS))
+
+
+class InlinePool:
+    """Stands in for the process pool: runs each task here, or fails like a pool whose worker died."""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        fut = Future()
+        if self.broken:
+            fut.set_exception(BrokenProcessPool("worker died"))
+        else:
+            fut.set_result(fn(*args))
+        return fut
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Pools handed out by resources.get("video_pool"), built from a queue of broken flags."""
+    built, plan = [], []
+
+    def factory():
+        built.append(InlinePool(broken=plan.pop(0)))
+        return built[-1]
+
+    monkeypatch.setitem(resources._factories, "video_pool", (factory, False))
+    monkeypatch.delitem(resources._instances, "video_pool", raising=False)
+    return built, plan
+
+
+def test_broken_pool_is_rebuilt_and_retried(clip, pools):
+    built, plan = pools
+    plan.extend([True, False])
+    parts = segments._run_segments(str(clip), segments.plan_segments(TOTAL, 4, FPS), FPS, False)
+    assert len(built) == 2
+    assert built[0].shut_down and not built[1].shut_down
+    assert sum(len(records) for records, _ in parts) == len(range(0, TOTAL, FPS))
+    assert resources.get("video_pool") is built[1]
+
+
+def test_broken_pool_gives_up_after_retry(clip, pools):
+    built, plan = pools
+    plan.extend([True, True])
+    with pytest.raises(BrokenProcessPool):
+        segments._run_segments(str(clip), segments.plan_segments(TOTAL, 4, FPS), FPS, False)
+    assert len(built) == 2 and all(p.shut_down for p in built)
@@ -0,0 +1,77 @@
+import io
+
+from utils.session_cache import ResultCache, estimate_size
+
+
+def blob(n):
+    return b"x" * n
+
+
+def test_estimate_size():
+    assert estimate_size(blob(100)) == 100
+    assert estimate_size(io.BytesIO(blob(50))) == 50
+    assert estimate_size({"a": blob(10)}) == 64 + 1 + 10
+
+
+def test_lru_eviction_order():
+    cache = ResultCache(max_bytes=300)
+    for key in "abc":
+        assert cache.put(key, blob(100))
+    assert cache.get("a") is not None  # a is now the most recently used
+    cache.put("d", blob(100))
+    assert "b" not in cache
+    assert [k for k in "acd" if k in cache] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_cap():
+    cache = ResultCache(max_bytes=250)
+    cache.put("a", blob(100))
+    cache.put("b", blob(100))
+    cache.put("c", blob(100))
+    assert cache.total_bytes <= 250
+    assert len(cache) == 2
+    # an unpinned result larger than the whole cap is not stored
+    assert not cache.put("huge", blob(251))
+    assert "huge" not in cache and len(cache) == 2
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = ResultCache(max_bytes=1000)
+    cache.put("a", blob(100))
+    cache.put("a", blob(300))
+    assert cache.total_bytes == 300 and len(cache) == 1
+
+
+def test_pinned_result_is_never_evicted():
+    cache = ResultCache(max_bytes=200)
+    cache.put("shown", blob(100), pinned=True)
+    for key in "abcd":
+        cache.put(key, blob(100))
+    assert cache.get("shown") is not None
+    assert cache.stats()["pinned"] == 1
+
+
+def test_oversized_pinned_result_is_kept():
+    cache = ResultCache(max_bytes=200)
+    cache.put("a", blob(100))
+    assert cache.put("big", blob(500), pinned=True)
+    # everything else made room; the pinned result stays even though it alone exceeds the cap
+    assert "big" in cache and "a" not in cache
+
+
+def test_unpin_makes_evictable():
+    cache = ResultCache(max_bytes=200)
+    cache.put("big", blob(500), pinned=True)
+    cache.unpin("big")
+    assert "big" not in cache
+    assert cache.total_bytes == 0 and cache.stats()["pinned"] == 0
+
+
+def test_hit_and_miss_counters():
+    cache = ResultCache()
+    cache.put("a", blob(1))
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
@@ -0,0 +1,43 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from utils import video_model
+from utils.phash import VIDEO_KEYFRAMES, PerceptualHashIndex
+
+VIDEO = Path(__file__).resolve().parent.parent / "assets" / "262696_small.mp4"
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # uploads live under relative paths; the hash index starts empty
+    monkeypatch.chdir(tmp_path)
+    index = PerceptualHashIndex(db_path=tmp_path / "idx.db")
+    monkeypatch.setattr(video_model, "get_phash_index", lambda: index)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"segments": 2}, {"early_exit": True}])
+def test_duplicate_found_before_full_decode(kwargs, monkeypatch):
+    with open(VIDEO, "rb") as f:
+        first = video_model.analyze_video(f, sample_seconds=1, **kwargs)
+    assert first["duplicate_of"] is None
+
+    def no_decode(*args, **kw):
+        raise AssertionError("full decode after a keyframe match")
+
+    monkeypatch.setattr(video_model, "extract_frames_at", no_decode)
+    monkeypatch.setattr("utils.segments.analyze_segments", no_decode)
+    with open(VIDEO, "rb") as f:
+        again = video_model.analyze_video(f, sample_seconds=1, **kwargs)
+    assert again["duplicate_of"]["analysis_id"] == first["analysis_id"]
+    assert again["verdict"] == first["verdict"]
+    assert len(again["frames_info"]) == VIDEO_KEYFRAMES
+    assert again["gait"] is None
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"segments": 2}, {"early_exit": True}, {"long": True}])
+def test_undecodable_video_raises(kwargs):
+    analyze = video_model.analyze_long_video if kwargs.pop("long", False) else video_model.analyze_video
+    with pytest.raises(ValueError):
+        analyze(io.BytesIO(b"\x00" * 4096), **kwargs)
@@ -0,0 +1,199 @@
+# utils/artifacts.py
+import cv2
+import numpy as np
+from utils import resources
+from utils.crops import CROP_MARGIN
+
+# -------------------------------
+# HANDCRAFTED DEEPFAKE ARTIFACT FEATURES
+# -------------------------------
+# Everything here takes a whole batch of face crops stacked as
+# (N, H, W, 3) uint8 BGR. The image work runs crop by crop (one OpenCV call per
+# filter, all temporaries a single crop in size and reused, so they stay in
+# cache); each crop leaves only a few masked sums behind, and the features
+# are finished with vectorized math over the batch.
+#
+#   hf_ratio_{1,2,3}   spectral energy above 1/4, 1/2, 3/4 of Nyquist / total
+#                      (face swaps are usually smoothed -> high bands deficient)
+#   lap_var            variance of the Laplacian (blur / sharpness)
+#   chan_inconsistency spread of per-channel noise level (blended regions come
+#                      from different sources and rarely share sensor noise)
+#   boundary_ratio     gradient energy on the original box edge vs. inside the
+#                      face (blending seams sit on that edge)
+
+FEATURE_NAMES = ["hf_ratio_1", "hf_ratio_2", "hf_ratio_3", "lap_var", "chan_inconsistency", "boundary_ratio"]
+TEMPORAL_NAMES = ["flicker", "hf_ratio_3_std", "boundary_ratio_std"]
+
+_BANDS = (0.25, 0.5, 0.75)
+_masks = {}  # (H, W, margin) -> precomputed band / ring masks
+
+
+def _masks_for(h, w, margin):
+    key = (h, w, margin)
+    if key not in _masks:
+        # normalized radial frequency of every DFT bin (1.0 = Nyquist)
+        fy = np.abs(np.fft.fftfreq(h))[:, None] * 2
+        fx = np.abs(np.fft.fftfreq(w))[None, :] * 2
+        radius = np.sqrt(fy ** 2 + fx ** 2)
+        bands = np.stack([radius >= b for b in _BANDS]).astype(np.float32)  # (B, H, W)
+
+        # the detector box occupies [m/(1+2m), (1+m)/(1+2m)] of an expanded crop
+        lo, hi = margin / (1 + 2 * margin), (1 + margin) / (1 + 2 * margin)
+        yy = (np.arange(h)[:, None] + 0.5) / h
+        xx = (np.arange(w)[None, :] + 0.5) / w
+        # distance (in crop fractions) to the box outline
+        inside = (yy >= lo) & (yy <= hi) & (xx >= lo) & (xx <= hi)
+        edge_dist = np.minimum(np.minimum(np.abs(yy - lo), np.abs(yy - hi)),
+                               np.minimum(np.abs(xx - lo), np.abs(xx - hi)))
+        band = 0.04
+        ring = (edge_dist <= band) & (yy >= lo - band) & (yy <= hi + band) & (xx >= lo - band) & (xx <= hi + band)
+        core = inside & ~ring
+        # rows: DC-free total, then one per band; every bin is repeated for the
+        # (re, im) pair of cv2.dft's complex output, so squared output @ mask = power
+        spectral = np.concatenate([(radius > 0)[None].astype(np.float32), bands]).reshape(len(_BANDS) + 1, -1)
+        edges = np.stack([ring / max(ring.sum(), 1), core / max(core.sum(), 1)]).astype(np.float32)
+        _masks[key] = (np.ascontiguousarray(np.repeat(spectral, 2, axis=1).T), edges.reshape(2, -1).T.copy())
+    return _masks[key]
+
+
+def crop_features(crops, margin=CROP_MARGIN):
+    """
+    crops: (N, H, W, 3) uint8 BGR face crops (expanded by margin).
+    Returns (N, len(FEATURE_NAMES)) float32.
+    """
+    n, h, w = crops.shape[:3]
+    if n == 0:
+        return np.empty((0, len(FEATURE_NAMES)), np.float32)
+    spectral, edges = _masks_for(h, w, margin)
+    gray = np.empty((h, w), np.float32)
+    spec = np.empty((h, w, 2), np.float32)
+    power = np.empty((n, spectral.shape[1]), np.float32)   # DC-free total, band energies
+    edge_mean = np.empty((n, 2), np.float32)               # gradient on box outline, inside
+    lap_std = np.empty((n, 4), np.float32)                 # Laplacian std: luma, B, G, R
+    for i in range(n):
+        crop = crops[i]
+        gray[...] = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        cv2.dft(gray, spec, flags=cv2.DFT_COMPLEX_OUTPUT)
+        power[i] = np.square(spec, out=spec).reshape(-1) @ spectral
+        # 4-neighbour Laplacians (ksize=1, int16 is exact for uint8); border row/column dropped
+        lap_std[i, 0] = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F, ksize=1)[1:-1, 1:-1])[1][0, 0]
+        lap_std[i, 1:] = cv2.meanStdDev(cv2.Laplacian(crop, cv2.CV_16S, ksize=1)[1:-1, 1:-1])[1].ravel()
+        # central differences; neither mask reaches the crop border
+        mag = cv2.magnitude(cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=1), cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=1))
+        edge_mean[i] = mag.reshape(-1) @ edges
+
+    # spectrum: energy above each band over the total without DC (mean brightness doesn't matter)
+    hf = power[:, 1:] / (power[:, :1] + 1e-6)
+    lap_var = lap_std[:, 0] ** 2
+    # per-channel noise level (Laplacian std), spread relative to its mean
+    chan_noise = lap_std[:, 1:]
+    chan_inc = chan_noise.std(axis=1) / (chan_noise.mean(axis=1) + 1e-6)
+    # gradient energy on the box outline vs inside the face
+    boundary = edge_mean[:, 0] / (edge_mean[:, 1] + 1e-6)
+
+    return np.column_stack([hf, lap_var, chan_inc, boundary]).astype(np.float32)
+
+
+def temporal_features(per_frame, frame_luma):
+    """
+    Statistics across the frames of a clip.
+    per_frame: (T, F) mean crop features per frame (rows of NaN for frames without faces).
+    frame_luma: (T,) mean face luminance per frame (NaN without faces).
+    Returns (len(TEMPORAL_NAMES),) float32.
+    """
+    per_frame = np.asarray(per_frame, np.float32).reshape(-1, len(FEATURE_NAMES))
+    luma = np.asarray(frame_luma, np.float32)
+    valid = ~np.isnan(luma)
+    if valid.sum() < 2:
+        return np.zeros(len(TEMPORAL_NAMES), np.float32)
+    flicker = np.abs(np.diff(luma[valid])).mean()
+    rows = per_frame[valid]
+    return np.array([
+        flicker,
+        rows[:, FEATURE_NAMES.index("hf_ratio_3")].std(),
+        rows[:, FEATURE_NAMES.index("boundary_ratio")].std(),
+    ], np.float32)
+
+
+def clip_features(frames_faces):
+    """
+    Crop + temporal features for a clip.
+    frames_faces: iterable of (frame_bgr, faces) in time order.
+    Crops of all frames are stacked into one crop_features call.
+    Returns (per_frame (T, F) with NaN rows for faceless frames, luma (T,)).
+    """
+    frames_faces = list(frames_faces)
+    n_frames = len(frames_faces)
+    per_frame = np.full((n_frames, len(FEATURE_NAMES)), np.nan, np.float32)
+    luma = np.full(n_frames, np.nan, np.float32)
+    with resources.borrow("crops_features") as stage:
+        stack, owners = stage(frames_faces)
+        if not len(stack):
+            return per_frame, luma
+        feats = crop_features(stack)
+        crop_luma = stack.reshape(len(stack), -1).mean(axis=1)
+        counts = np.bincount(owners, minlength=n_frames)
+        has = counts > 0
+        for j in range(len(FEATURE_NAMES)):
+            per_frame[has, j] = np.bincount(owners, weights=feats[:, j], minlength=n_frames)[has] / counts[has]
+        luma[has] = np.bincount(owners, weights=crop_luma, minlength=n_frames)[has] / counts[has]
+    return per_frame, luma
+
+
+def summarize_clip(per_frame, luma):
+    """(score, {feature: value}) for a clip from clip_features() output."""
+    per_frame = np.asarray(per_frame, np.float32).reshape(-1, len(FEATURE_NAMES))
+    rows = per_frame[~np.isnan(per_frame).any(axis=1)]
+    temporal = temporal_features(per_frame, luma)
+    summary = features_dict(rows)
+    summary.update({name: float(v) for name, v in zip(TEMPORAL_NAMES, temporal)})
+    return artifact_score(rows, temporal), summary
+
+
+# -------------------------------
+# HEURISTIC SCORE
+# -------------------------------
+# Hand-set references and weights -- a placeholder until a classifier is
+# fitted on these features. Each term is mapped to [0, 1], 1 = more fake-like.
+_LAP_REF = 100.0
+_HF_REF = 0.05
+_CHAN_REF = 0.5
+_FLICKER_REF = 10.0
+
+
+def artifact_score(features, temporal=None):
+    """Probability-like deepfake score in [0, 1] from crop (and optional temporal) features."""
+    f = np.atleast_2d(np.asarray(features, np.float32))
+    if f.size == 0:
+        return 0.5
+    f = f.mean(axis=0)
+    idx = {name: i for i, name in enumerate(FEATURE_NAMES)}
+    terms = [
+        (0.25, 1 - min(f[idx["lap_var"]] / _LAP_REF, 1.0)),
+        (0.25, 1 - min(f[idx["hf_ratio_3"]] / _HF_REF, 1.0)),
+        (0.35, float(np.clip(f[idx["boundary_ratio"]] - 1.0, 0.0, 1.0))),
+        (0.15, min(f[idx["chan_inconsistency"]] / _CHAN_REF, 1.0)),
+    ]
+    if temporal is not None:
+        terms.append((0.25, min(float(temporal[0]) / _FLICKER_REF, 1.0)))
+    total = sum(w for w, _ in terms)
+    return float(sum(w * v for w, v in terms) / total)
+
+
+def features_dict(features):
+    """Mean crop features as {name: float} for JSON results."""
+    f = np.atleast_2d(np.asarray(features, np.float32))
+    if f.size == 0:
+        return {}
+    return {name: float(v) for name, v in zip(FEATURE_NAMES, f.mean(axis=0))}
+
+
+# Share of the final deepfake probability taken by the artifact score.
+ARTIFACT_WEIGHT = 0.5
+
+
+def combine_scores(model_prob, artifact_prob, weight=ARTIFACT_WEIGHT):
+    """(verdict, confidence %) from the model's and the artifact features' deepfake probabilities."""
+    p = (1 - weight) * model_prob + weight * artifact_prob
+    verdict = "deepfake" if p >= 0.5 else "authentic"
+    return verdict, 50 + abs(p - 0.5) * 100
@@ -0,0 +1,112 @@
+# utils/crops.py
+import cv2
+import numpy as np
+from utils import resources
+
+# -------------------------------
+# FACE-CROP EXTRACTION & NORMALIZATION
+# -------------------------------
+# Boxes are grown by this fraction on every side so crops include the
+# blending boundary around the face, not just the face itself.
+CROP_MARGIN = 0.25
+# ImageNet statistics (BGR order) used by most pretrained backbones.
+IMAGENET_MEAN_BGR = (103.53, 116.28, 123.675)
+IMAGENET_STD_BGR = (57.375, 57.12, 58.395)
+
+
+def expand_box(box, margin):
+    """Square box around [x, y, w, h], grown by margin per side; may extend past the frame."""
+    x, y, w, h = box
+    side = max(w, h) * (1 + 2 * margin)
+    cx, cy = x + w / 2, y + h / 2
+    return cx - side / 2, cy - side / 2, side
+
+
+class CropStage:
+    """
+    Turns the face boxes of one or many frames into a contiguous
+    (N, size, size, 3) batch: boxes are squared and expanded, resized, padded
+    with pad_value where they leave the frame and (optionally) normalized
+    with mean/std into a float32 batch.
+
+    Output arrays are views into buffers owned by the stage and reused on the
+    next call -- consume (or copy) them before calling again. Buffers only
+    grow (doubling), so steady-state video analysis allocates nothing per face.
+    """
+
+    def __init__(self, size=224, margin=CROP_MARGIN, mean=None, std=None, pad_value=0, capacity=32):
+        self.size = size
+        self.margin = margin
+        self.pad_value = pad_value
+        self.mean = None if mean is None else np.asarray(mean, np.float32)
+        self.inv_std = None if std is None else (1.0 / np.asarray(std, np.float32))
+        self._u8 = np.empty((capacity, size, size, 3), np.uint8)
+        self._f32 = None
+        self._owners = np.empty(capacity, np.int32)
+
+    def _reserve(self, n):
+        if n <= len(self._u8):
+            return
+        cap = len(self._u8)
+        while cap < n:
+            cap *= 2
+        self._u8 = np.empty((cap, self.size, self.size, 3), np.uint8)
+        self._owners = np.empty(cap, np.int32)
+        if self._f32 is not None:
+            self._f32 = np.empty((cap, self.size, self.size, 3), np.float32)
+
+    def _crop_into(self, frame, box, dst):
+        fh, fw = frame.shape[:2]
+        x0, y0, side = expand_box(box, self.margin)
+        ix0, iy0 = int(round(x0)), int(round(y0))
+        ix1, iy1 = int(round(x0 + side)), int(round(y0 + side))
+        if ix0 >= 0 and iy0 >= 0 and ix1 <= fw and iy1 <= fh and ix1 > ix0 and iy1 > iy0:
+            # common case: fully inside -> area resampling straight into the slot
+            cv2.resize(frame[iy0:iy1, ix0:ix1], (self.size, self.size), dst=dst, interpolation=cv2.INTER_AREA)
+            return
+        # partly outside: one affine warp does scale + translate + constant padding
+        s = self.size / side
+        m = np.array([[s, 0, -x0 * s], [0, s, -y0 * s]], np.float32)
+        cv2.warpAffine(frame, m, (self.size, self.size), dst=dst, flags=cv2.INTER_LINEAR,
+                       borderMode=cv2.BORDER_CONSTANT, borderValue=(self.pad_value,) * 3)
+
+    def __call__(self, frames_boxes):
+        """
+        frames_boxes: iterable of (frame_bgr, [[x, y, w, h], ...]).
+        Returns (crops_u8 (N, S, S, 3), owners (N,)) -- owners[i] is the
+        position of the frame crop i came from.
+        """
+        frames_boxes = list(frames_boxes)
+        n = sum(len(boxes) for _, boxes in frames_boxes)
+        self._reserve(max(n, 1))
+        i = 0
+        for t, (frame, boxes) in enumerate(frames_boxes):
+            for box in boxes:
+                self._crop_into(frame, box, self._u8[i])
+                self._owners[i] = t
+                i += 1
+        return self._u8[:n], self._owners[:n]
+
+    def normalize(self, crops_u8):
+        """(crops - mean) / std into the stage's float32 buffer (no temporaries)."""
+        n = len(crops_u8)
+        if self._f32 is None or len(self._f32) < len(self._u8):
+            self._f32 = np.empty(self._u8.shape, np.float32)
+        out = self._f32[:n]
+        if self.mean is not None:
+            np.subtract(crops_u8, self.mean, out=out)
+        else:
+            out[...] = crops_u8
+        if self.inv_std is not None:
+            np.multiply(out, self.inv_std, out=out)
+        return out
+
+
+# Model-input crops (normalized for the classifier) and smaller uint8 crops
+# for the artifact features. Pooled: a stage's buffers belong to one caller at a time.
+MODEL_INPUT = 224
+FEATURE_CROP = 128
+
+resources.register("crops_model",
+                   lambda: CropStage(MODEL_INPUT, mean=IMAGENET_MEAN_BGR, std=IMAGENET_STD_BGR), pooled=True)
+resources.register("crops_features", lambda: CropStage(FEATURE_CROP), pooled=True)
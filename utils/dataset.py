@@ -0,0 +1,219 @@
+# utils/dataset.py
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+
+# -------------------------------
+# MEMORY-MAPPED TRAINING DATASETS
+# -------------------------------
+# Layout of a dataset directory:
+#   index.json               fields {name: [shape, dtype]}, shard_size, shards [{rows}]
+#   <field>-00000.npy ...    one .npy per field per shard, shard_size rows each
+#   meta.jsonl               one JSON object per sample (source video, frame, box, ...)
+# Shards are written through np.lib.format.open_memmap, so a writer never holds
+# more than the rows it is given, and readers mmap them: random access costs a
+# page fault, not a decode, and the OS page cache is the only cache.
+SHARD_SIZE = 4096
+INDEX_FILE = "index.json"
+META_FILE = "meta.jsonl"
+
+
+class DatasetWriter:
+    """
+    Append samples to a sharded memmap dataset.
+    fields: {name: (shape, dtype)} -- the per-sample shape of each array.
+    As a context manager the index is written only when the block completes.
+    """
+
+    def __init__(self, root, fields, shard_size=SHARD_SIZE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        if (self.root / INDEX_FILE).exists():
+            raise FileExistsError(f"{self.root} already holds a dataset")
+        self.fields = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in fields.items()}
+        self.shard_size = shard_size
+        self.shards = []       # rows per finished shard
+        self._arrays = None    # open memmaps of the current shard
+        self._rows = 0         # rows written to the current shard
+        self._meta = open(self.root / META_FILE, "w", encoding="utf-8")
+
+    def _file(self, name, shard):
+        return self.root / f"{name}-{shard:05d}.npy"
+
+    def _open_shard(self):
+        shard = len(self.shards)
+        self._arrays = {
+            name: np.lib.format.open_memmap(self._file(name, shard), mode="w+", dtype=dtype,
+                                            shape=(self.shard_size, *shape))
+            for name, (shape, dtype) in self.fields.items()
+        }
+        self._rows = 0
+
+    def _close_shard(self):
+        shard = len(self.shards)
+        for name, arr in self._arrays.items():
+            arr.flush()
+            if self._rows < self.shard_size:
+                # last shard: shrink the file to the rows actually written
+                tmp = self._file(name, shard).with_suffix(".part")
+                np.save(tmp, arr[:self._rows])
+                del arr
+                tmp.with_suffix(".part.npy").replace(self._file(name, shard))
+        self.shards.append(self._rows)
+        self._arrays = None
+
+    def add(self, sample, meta=None):
+        """Write one sample ({field: array}); meta is any JSON-able dict."""
+        if self._arrays is None:
+            self._open_shard()
+        for name, arr in self._arrays.items():
+            arr[self._rows] = sample[name]
+        self._rows += 1
+        self._meta.write(json.dumps(meta or {}) + "\n")
+        if self._rows == self.shard_size:
+            self._close_shard()
+
+    def add_batch(self, samples, metas=None):
+        """Write N samples at once ({field: (N, ...) array}), split across shards as needed."""
+        n = len(next(iter(samples.values())))
+        metas = metas or [{}] * n
+        done = 0
+        while done < n:
+            if self._arrays is None:
+                self._open_shard()
+            take = min(n - done, self.shard_size - self._rows)
+            for name, arr in self._arrays.items():
+                arr[self._rows:self._rows + take] = samples[name][done:done + take]
+            for m in metas[done:done + take]:
+                self._meta.write(json.dumps(m) + "\n")
+            self._rows += take
+            done += take
+            if self._rows == self.shard_size:
+                self._close_shard()
+
+    def close(self):
+        """Finish the last (partial) shard and write the index; the dataset is readable after this."""
+        if self._arrays is not None:
+            self._close_shard()
+        self._meta.close()
+        index = {
+            "fields": {name: [list(shape), dtype.str] for name, (shape, dtype) in self.fields.items()},
+            "shard_size": self.shard_size,
+            "shards": [{"rows": rows} for rows in self.shards],
+        }
+        with open(self.root / INDEX_FILE, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # the block failed: release the files but write no index, so the
+        # partial dataset can't be opened as if it were complete
+        self._arrays = None
+        self._meta.close()
+
+
+class MemmapDataset:
+    """Random-access reader over a dataset written by DatasetWriter."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        with open(self.root / INDEX_FILE, encoding="utf-8") as f:
+            index = json.load(f)
+        self.fields = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in index["fields"].items()}
+        self.shard_size = index["shard_size"]
+        rows = [s["rows"] for s in index["shards"]]
+        self._offsets = np.concatenate([[0], np.cumsum(rows)]).astype(np.int64)
+        self._shards = [
+            {name: np.load(self.root / f"{name}-{i:05d}.npy", mmap_mode="r")[:n] for name in self.fields}
+            for i, n in enumerate(rows)
+        ]
+        self._meta = None
+        self._meta_lock = threading.Lock()
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def _locate(self, indices):
+        indices = np.asarray(indices, np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("dataset index out of range")
+        shard = np.searchsorted(self._offsets, indices, side="right") - 1
+        return shard, indices - self._offsets[shard]
+
+    def __getitem__(self, i):
+        shard, row = self._locate([i])
+        return {name: np.array(arr[row[0]]) for name, arr in self._shards[shard[0]].items()}
+
+    def batch(self, indices, fields=None):
+        """
+        {field: (len(indices), ...) array} in the order given. Rows are gathered
+        shard by shard in ascending order so reads stay as sequential as possible.
+        """
+        fields = fields or list(self.fields)
+        shard, row = self._locate(indices)
+        out = {name: np.empty((len(row), *self.fields[name][0]), self.fields[name][1]) for name in fields}
+        for s in np.unique(shard):
+            pos = np.nonzero(shard == s)[0]
+            order = np.argsort(row[pos], kind="stable")
+            pos, rows = pos[order], row[pos][order]
+            for name in fields:
+                out[name][pos] = self._shards[s][name][rows]
+        return out
+
+    def meta(self, i):
+        """Metadata of sample i (meta.jsonl is read once, on first use)."""
+        with self._meta_lock:
+            if self._meta is None:
+                with open(self.root / META_FILE, encoding="utf-8") as f:
+                    self._meta = [json.loads(line) for line in f]
+        return self._meta[i]
+
+
+class PrefetchLoader:
+    """
+    Iterate a MemmapDataset in batches, with `workers` threads gathering up to
+    `prefetch` batches ahead of the consumer (memmap copies release the GIL).
+    A new shuffled order is drawn each epoch when shuffle=True.
+    """
+
+    def __init__(self, dataset, batch_size=64, shuffle=True, drop_last=False, workers=4, prefetch=8,
+                 fields=None, seed=None):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.workers = workers
+        self.prefetch = max(prefetch, workers)
+        self.fields = fields
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        n = len(self.dataset)
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+    def _batches(self):
+        order = self._rng.permutation(len(self.dataset)) if self.shuffle else np.arange(len(self.dataset))
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            if self.drop_last and len(idx) < self.batch_size:
+                return
+            yield idx
+
+    def __iter__(self):
+        batches = self._batches()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch") as pool:
+            pending = deque()
+            for idx in batches:
+                pending.append(pool.submit(self.dataset.batch, idx, self.fields))
+                if len(pending) >= self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
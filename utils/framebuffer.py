@@ -0,0 +1,197 @@
+# utils/framebuffer.py
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from utils.processing import video_meta
+from utils import runtime
+
+# -------------------------------
+# SHARED-MEMORY FRAME RING
+# -------------------------------
+# Decoded frames are written once into preallocated slots of a shared-memory
+# block; detection workers receive slot indices over a queue, read the frame
+# in place and hand the slot back. Nothing frame-sized is ever pickled.
+#
+# Slot lifecycle:  free_q --acquire()--> writer fills slot --publish()-->
+#                  task_q --worker reads view--> release() --> free_q
+# When every slot is in flight acquire() blocks, which throttles decoding to
+# the speed of analysis (back-pressure) and bounds memory to n_slots frames.
+
+# Seconds to wait on a queue before checking that the workers are still alive.
+_POLL = 1.0
+
+
+class SharedFrameRing:
+    """Fixed number of equally sized frame slots in one shared-memory block."""
+
+    def __init__(self, shm, n_slots, shape, dtype, free_q, owner):
+        self.shm = shm
+        self.n_slots = n_slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.free_q = free_q
+        self._owner = owner
+        self._frames = np.ndarray((n_slots,) + self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, n_slots, shape, dtype=np.uint8, ctx=None):
+        """Allocate the ring (owner side); every slot starts out free."""
+        ctx = ctx or mp.get_context("spawn")
+        size = int(n_slots * np.prod(shape) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        free_q = ctx.Queue()
+        for slot in range(n_slots):
+            free_q.put(slot)
+        return cls(shm, n_slots, shape, dtype, free_q, owner=True)
+
+    def spec(self):
+        """Picklable description used by workers to attach()."""
+        return {"name": self.shm.name, "n_slots": self.n_slots, "shape": self.shape,
+                "dtype": self.dtype.str, "free_q": self.free_q}
+
+    @classmethod
+    def attach(cls, spec):
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        return cls(shm, spec["n_slots"], spec["shape"], spec["dtype"], spec["free_q"], owner=False)
+
+    def view(self, slot):
+        """Zero-copy array over one slot."""
+        return self._frames[slot]
+
+    def acquire(self, timeout=None):
+        """Next free slot; blocks while all slots are in flight (back-pressure)."""
+        return self.free_q.get(timeout=timeout)
+
+    def write(self, slot, frame):
+        dst = self._frames[slot]
+        if frame.shape == dst.shape:
+            np.copyto(dst, frame)
+        else:
+            # odd-sized frame (resolution change mid-stream): fit it into the slot
+            cv2.resize(frame, (dst.shape[1], dst.shape[0]), dst=dst)
+
+    def release(self, slot):
+        self.free_q.put(slot)
+
+    def close(self):
+        self._frames = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+# -------------------------------
+# DECODE -> DETECT PIPELINE
+# -------------------------------
+def _detect_worker(spec, task_q, result_q):
+    """Worker process: detect faces on frames read straight from ring slots."""
+    from utils.segments import frame_record  # heavy imports happen in the child
+    runtime.configure_worker()
+    ring = SharedFrameRing.attach(spec)
+    try:
+        while True:
+            task = task_q.get()
+            if task is None:
+                break
+            slot, idx, ts = task
+            try:
+                result_q.put(frame_record(idx, ts, ring.view(slot)))
+            except Exception as e:  # report instead of hanging the parent
+                result_q.put({"index": idx, "error": repr(e)})
+            finally:
+                ring.release(slot)
+    finally:
+        ring.close()
+
+
+def detect_frames_shared(path, fps_sample=1, n_workers=None, n_slots=None, frame_callback=None):
+    """
+    extract_frames -> detect_faces_in_frame with the two stages in different
+    processes: this process decodes the video at path into a SharedFrameRing
+    sized from its resolution, n_workers processes detect on the slots.
+    frame_callback: as in extract_frames, called here for every decoded frame.
+    Returns per-frame records (see utils.segments.frame_record) in frame order.
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        return []
+    fps, _ = video_meta(cap)
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if not w or not h:
+        cap.release()
+        return []
+    n_workers = n_workers or max(1, runtime.available_cpus() - 1)
+    ctx = mp.get_context("spawn")
+    ring = SharedFrameRing.create(n_slots or 2 * n_workers + 2, (h, w, 3), ctx=ctx)
+    task_q, result_q = ctx.Queue(), ctx.Queue()
+    workers = [ctx.Process(target=_detect_worker, args=(ring.spec(), task_q, result_q), daemon=True)
+               for _ in range(n_workers)]
+    for p in workers:
+        p.start()
+    records, sent = [], 0
+    try:
+        sample_interval = max(1, int(fps * fps_sample))
+        frame_index = 0
+        while cap.grab():
+            keep = frame_index % sample_interval == 0
+            if keep or frame_callback is not None:
+                ret, frame = cap.retrieve()
+                if ret and frame_callback is not None:
+                    frame_callback(frame_index, frame)
+                if ret and keep:
+                    slot = _acquire(ring, workers, result_q, records)
+                    ring.write(slot, frame)
+                    task_q.put((slot, frame_index, frame_index / fps))
+                    sent += 1
+            frame_index += 1
+        while len(records) < sent:
+            records.append(_get_result(result_q, workers))
+    finally:
+        cap.release()
+        for _ in workers:
+            task_q.put(None)
+        for p in workers:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        ring.close()
+    errors = [r for r in records if "error" in r]
+    if errors:
+        raise RuntimeError(f"face detection failed on frame {errors[0]['index']}: {errors[0]['error']}")
+    records.sort(key=lambda r: r["index"])
+    return records
+
+
+def _acquire(ring, workers, result_q, records):
+    """Wait for a free slot, draining finished results meanwhile so workers never stall."""
+    while True:
+        try:
+            return ring.acquire(timeout=_POLL)
+        except queue.Empty:
+            _drain(result_q, records)
+            _check_alive(workers)
+
+
+def _drain(result_q, records):
+    while True:
+        try:
+            records.append(result_q.get_nowait())
+        except queue.Empty:
+            return
+
+
+def _get_result(result_q, workers):
+    while True:
+        try:
+            return result_q.get(timeout=_POLL)
+        except queue.Empty:
+            _check_alive(workers)
+
+
+def _check_alive(workers):
+    dead = [p for p in workers if not p.is_alive()]
+    if dead:
+        raise RuntimeError(f"detection worker exited unexpectedly (exit code {dead[0].exitcode})")
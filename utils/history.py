@@ -0,0 +1,257 @@
+# utils/history.py
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from utils.sql_auth import DB_PATH
+from utils.ingest import MEDIA_DIR
+from utils import resources
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# ANALYSIS HISTORY
+# -------------------------------
+# Every fresh analysis is recorded in users.db (who, which media, verdict,
+# confidence, when). Annotated images / contact sheets go to a content-addressed
+# blob directory (media/blobs/ab/<sha256>.png) and the row only keeps the
+# digest, so identical images are stored once. Writes are queued and committed
+# in batches by a background thread so the dashboard never waits on SQLite or
+# the disk; the same thread applies the retention policy.
+BLOB_DIR = MEDIA_DIR / "blobs"
+RETENTION_DAYS = int(os.environ.get("DEEPSECURE_HISTORY_DAYS", "90"))
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 2.0       # seconds a queued record may wait for a batch to fill
+PRUNE_INTERVAL = 6 * 3600  # seconds between retention passes
+
+
+def media_digest(data):
+    """SHA-256 of an upload (anything with getbuffer()/read()) or of text."""
+    h = hashlib.sha256()
+    if isinstance(data, str):
+        h.update(data.encode("utf-8"))
+    elif hasattr(data, "getbuffer"):
+        h.update(data.getbuffer())
+    else:
+        pos = data.tell()
+        data.seek(0)
+        for chunk in iter(lambda: data.read(1 << 20), b""):
+            h.update(chunk)
+        data.seek(pos)
+    return h.hexdigest()
+
+
+def _payload_bytes(obj):
+    if obj is None:
+        return None
+    if hasattr(obj, "getvalue"):  # BytesIO
+        return obj.getvalue()
+    return bytes(obj)
+
+
+def _summary(mode, result):
+    """Small JSON-able part of a result worth keeping (no image payloads)."""
+    if mode == "text":
+        return {k: result.get(k) for k in ("sentiment", "confidence", "similarity")}
+    keep = ("image_size", "working_size", "artifacts", "analysis_id", "duplicate_of",
+            "segments", "detect_workers", "windows", "windows_resumed",
+            "frames_used", "frames_decoded", "stopped", "score_interval")
+    out = {k: result[k] for k in keep if result.get(k) is not None}
+    if "faces" in result:
+        out["faces"] = len(result["faces"])
+    if "frames_info" in result:
+        out["frames"] = len(result["frames_info"])
+    return out
+
+
+class AnalysisHistory:
+    """Batched, indexed analysis log with a content-addressed blob store."""
+
+    def __init__(self, db_path=DB_PATH, blob_dir=BLOB_DIR, retention_days=RETENTION_DAYS,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.blob_dir = blob_dir
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._last_prune = 0.0
+        conn = self._get_conn()
+        self._init_db(conn)
+        conn.close()
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self, conn):
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_email TEXT,
+            media_hash TEXT,
+            mode TEXT,
+            verdict TEXT,
+            confidence REAL,
+            created_at INTEGER,
+            blob TEXT,
+            summary TEXT
+        );
+        """)
+        # "my recent analyses" and "all <verdict> results in a date range"
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user_time "
+                     "ON analysis_history(user_email, created_at DESC);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_verdict_time "
+                     "ON analysis_history(verdict, created_at);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_media ON analysis_history(media_hash);")
+        conn.commit()
+
+    # ---- blobs ----
+    def blob_path(self, digest):
+        return self.blob_dir / digest[:2] / f"{digest}.png"
+
+    def _put_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+            with os.fdopen(fd, "wb") as out:
+                out.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    # ---- writes (request path only enqueues) ----
+    def record(self, user_email, mode, media_hash, result, verdict=None):
+        """Queue one analysis for the background writer; returns immediately."""
+        if verdict is None:
+            verdict = result.get("verdict") or result.get("sentiment")
+        blob = _payload_bytes(result.get("annotated_image") or result.get("contact_sheet"))
+        self._queue.put((user_email, media_hash, mode, verdict, float(result.get("confidence") or 0.0),
+                         int(time.time()), blob, json.dumps(_summary(mode, result), default=str)))
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stop = True
+                elif item[0] == "__flush__":
+                    waiters.append(item[1])
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write(batch)
+                if time.time() - self._last_prune > PRUNE_INTERVAL:
+                    self.prune()
+            except Exception:  # history must never take the app down
+                logger.exception("history write failed")
+            for done in waiters:
+                done.set()
+
+    def _write(self, batch):
+        rows = []
+        for user_email, media_hash, mode, verdict, confidence, created_at, blob, summary in batch:
+            digest = self._put_blob(blob) if blob else None
+            rows.append((user_email, media_hash, mode, verdict, confidence, created_at, digest, summary))
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                "INSERT INTO analysis_history (user_email, media_hash, mode, verdict, confidence, created_at, "
+                "blob, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far has been written (tests / shutdown)."""
+        done = threading.Event()
+        self._queue.put(("__flush__", done))
+        done.wait(timeout)
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=10)
+
+    # ---- retention ----
+    def prune(self, retention_days=None):
+        """
+        Delete rows older than the retention period, then blobs no row references.
+        Runs on the writer thread (or with it idle), so no blob is being written meanwhile.
+        Returns (rows_deleted, blobs_deleted).
+        """
+        days = self.retention_days if retention_days is None else retention_days
+        self._last_prune = time.time()
+        cutoff = int(time.time() - days * 86400)
+        conn = self._get_conn()
+        try:
+            rows = conn.execute("DELETE FROM analysis_history WHERE created_at < ?", (cutoff,)).rowcount
+            conn.commit()
+            live = {r[0] for r in conn.execute("SELECT DISTINCT blob FROM analysis_history WHERE blob IS NOT NULL")}
+        finally:
+            conn.close()
+        blobs = 0
+        if self.blob_dir.exists():
+            for path in self.blob_dir.glob("*/*.png"):
+                if path.stem not in live:
+                    path.unlink(missing_ok=True)
+                    blobs += 1
+        return rows, blobs
+
+    # ---- queries ----
+    def _rows(self, sql, params):
+        conn = self._get_conn()
+        try:
+            out = []
+            for row in conn.execute(sql, params):
+                d = dict(row)
+                d["summary"] = json.loads(d["summary"]) if d["summary"] else {}
+                out.append(d)
+            return out
+        finally:
+            conn.close()
+
+    def recent(self, user_email, limit=20, mode=None):
+        """A user's latest analyses, newest first (served by idx_history_user_time)."""
+        if mode is None:
+            return self._rows("SELECT * FROM analysis_history WHERE user_email = ? "
+                              "ORDER BY created_at DESC LIMIT ?", (user_email, limit))
+        return self._rows("SELECT * FROM analysis_history WHERE user_email = ? AND mode = ? "
+                          "ORDER BY created_at DESC LIMIT ?", (user_email, mode, limit))
+
+    def by_verdict(self, verdict, start, end, limit=1000):
+        """All analyses with this verdict and start <= created_at < end (epoch seconds)."""
+        return self._rows("SELECT * FROM analysis_history WHERE verdict = ? AND created_at >= ? "
+                          "AND created_at < ? ORDER BY created_at LIMIT ?", (verdict, int(start), int(end), limit))
+
+    def for_media(self, media_hash):
+        return self._rows("SELECT * FROM analysis_history WHERE media_hash = ? ORDER BY created_at DESC",
+                          (media_hash,))
+
+
+resources.register("analysis_history", AnalysisHistory)
+
+
+def get_history():
+    return resources.get("analysis_history")
@@ -1,32 +1,221 @@
 # utils/image_model.py
 import random
 import time
-from utils.processing import detect_faces_in_frame, draw_face_boxes
-from PIL import Image
-import numpy as np
-import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.processing import decode_image, detect_faces_in_frame, draw_face_boxes, DETECT_MAX_SIDE
+from utils.artifacts import crop_features, artifact_score, features_dict, combine_scores
+from utils.crops import CROP_MARGIN
+from utils.phash import get_phash_index, phash, DEFAULT_MAX_DISTANCE
+from utils import resources, runtime
 
-def analyze_image(uploaded_file):
+# Images whose face crops are stacked into one inference call.
+BATCH_SIZE = 16
+
+
+# -------------------------------
+# PIPELINE STAGES
+# -------------------------------
+def _prepare(uploaded_file, dedup, max_distance, max_side):
+    """Decode, hash and (unless a near-duplicate exists) detect faces for one upload."""
+    arr, orig_size = decode_image(uploaded_file, max_side=max_side)
+    item = {
+        "frame": arr,
+        "sizes": {"image_size": list(orig_size), "working_size": [int(arr.shape[1]), int(arr.shape[0])]},
+        "hashes": [phash(arr)] if dedup else [],
+        "match": None,
+        "faces": [],
+    }
+    if dedup:
+        item["match"] = get_phash_index().lookup("image", item["hashes"], max_distance=max_distance)
+    if item["match"] is None:
+        item["faces"] = [[int(x), int(y), int(w), int(h)] for (x, y, w, h) in detect_faces_in_frame(arr)]
+    return item
+
+
+def _model_boxes(item):
+    """Face boxes to classify; the whole frame stands in when no face was found."""
+    if item["faces"]:
+        return item["faces"]
+    h, w = item["frame"].shape[:2]
+    side = max(w, h) / (1 + 2 * CROP_MARGIN)  # expands back to the full frame
+    return [[(w - side) / 2, (h - side) / 2, side, side]]
+
+
+def _predict_batch(items):
     """
-    uploaded_file: streamlit UploadedFile
-    Returns dict:
-      { verdict, confidence, faces: [{bbox:[x,y,w,h]}], annotated_image_bytes }
+    One inference call (and one artifact-feature pass) for all face crops of a
+    batch of images. Sets item["artifacts"]; returns [(verdict, confidence)] aligned with items.
     """
-    # read bytes and open
-    data = uploaded_file.read()
-    img = Image.open(io.BytesIO(data)).convert("RGB")
-    arr = np.array(img)[:, :, ::-1].copy()  # convert RGB -> BGR for OpenCV
-    # detect faces (demo)
-    faces = detect_faces_in_frame(arr)
-    annotated = draw_face_boxes(arr, faces) if faces else None
-    # dummy prediction (replace with your TF/PyTorch model)
-    time.sleep(0.6)
-    verdict = random.choice(["authentic", "deepfake"])
-    confidence = random.uniform(65, 98)
-    result = {
+    boxes = [_model_boxes(item) for item in items]
+    # artifact features on the same FEATURE_CROP crops as video, so scores are comparable
+    with resources.borrow("crops_features") as stage:
+        crops, owners = stage((item["frame"], b) for item, b in zip(items, boxes))
+        owners = owners.copy()  # stage buffers are reused once it's returned to the pool
+        feats = crop_features(crops)
+    with resources.borrow("crops_model") as stage:
+        crops, _ = stage((item["frame"], b) for item, b in zip(items, boxes))
+        batch = stage.normalize(crops)
+        # dummy prediction (replace with your TF/PyTorch model: scores = model.predict(batch))
+        _ = batch
+        time.sleep(0.6)
+        model_probs = [random.random() for _ in items]
+    preds = []
+    for i, item in enumerate(items):
+        item_feats = feats[owners == i]
+        p_art = artifact_score(item_feats)
+        item["artifacts"] = {"score": p_art, **features_dict(item_feats)}
+        preds.append(combine_scores(model_probs[i], p_art))
+    return preds
+
+
+def _image_space(faces, sizes):
+    """Boxes found at working_size, scaled to the original image_size."""
+    sx = sizes["image_size"][0] / sizes["working_size"][0]
+    sy = sizes["image_size"][1] / sizes["working_size"][1]
+    return [[round(x * sx), round(y * sy), round(w * sx), round(h * sy)] for (x, y, w, h) in faces]
+
+
+def _duplicate_result(item):
+    match = item["match"]
+    prev = match["result"]
+    arr = item["frame"]
+    # previous boxes are in the original's pixel space; rescale to this copy
+    sx = arr.shape[1] / prev["width"]
+    sy = arr.shape[0] / prev["height"]
+    faces = [[int(x * sx), int(y * sy), int(w * sx), int(h * sy)] for (x, y, w, h) in prev["faces"]]
+    return {
+        "verdict": prev["verdict"],
+        "confidence": prev["confidence"],
+        "faces": [{"bbox": f} for f in _image_space(faces, item["sizes"])],
+        "annotated_image": draw_face_boxes(arr, faces) if faces else None,
+        **item["sizes"],
+        "artifacts": prev.get("artifacts"),
+        "analysis_id": match["analysis_id"],
+        "duplicate_of": {
+            "analysis_id": match["analysis_id"],
+            "distance": match["distance"],
+            "created_at": match["created_at"],
+        },
+    }
+
+
+def _fresh_result(item, verdict, confidence, dedup):
+    arr, faces = item["frame"], item["faces"]
+    analysis_id = None
+    if dedup:
+        analysis_id = get_phash_index().add("image", item["hashes"], {
+            "verdict": verdict,
+            "confidence": confidence,
+            "faces": faces,
+            "artifacts": item.get("artifacts"),
+            "width": int(arr.shape[1]),
+            "height": int(arr.shape[0]),
+        })
+    return {
         "verdict": verdict,
         "confidence": confidence,
-        "faces": [{"bbox": [int(x), int(y), int(w), int(h)]} for (x,y,w,h) in faces],
-        "annotated_image": annotated  # BytesIO or None
+        "faces": [{"bbox": f} for f in _image_space(faces, item["sizes"])],
+        "annotated_image": draw_face_boxes(arr, faces) if faces else None,  # BytesIO or None
+        **item["sizes"],
+        "artifacts": item.get("artifacts"),
+        "analysis_id": analysis_id,
+        "duplicate_of": None,
     }
-    return result
+
+
+def _error_result(exc):
+    """Result for an upload that could not be analyzed; the rest of the batch carries on."""
+    return {
+        "verdict": None,
+        "confidence": None,
+        "faces": [],
+        "annotated_image": None,
+        "error": str(exc) or type(exc).__name__,
+        "analysis_id": None,
+        "duplicate_of": None,
+    }
+
+
+def _flush(pending, dedup):
+    """Run inference for the pending (position, item) pairs and yield their results."""
+    try:
+        preds = _predict_batch([item for _, item in pending])
+    except Exception as e:
+        for pos, _ in pending:
+            yield pos, _error_result(e)
+        return
+    for (pos, item), (verdict, confidence) in zip(pending, preds):
+        try:
+            res = _fresh_result(item, verdict, confidence, dedup)
+        except Exception as e:
+            res = _error_result(e)
+        yield pos, res
+
+
+# -------------------------------
+# PUBLIC API
+# -------------------------------
+def iter_analyze_images(uploaded_files, dedup=True, max_distance=DEFAULT_MAX_DISTANCE,
+                        max_side=DETECT_MAX_SIDE, batch_size=BATCH_SIZE, max_workers=None):
+    """
+    Analyze many uploads, yielding (position, result) as each one finishes.
+    Decoding + detection run in a thread pool (OpenCV / PIL release the GIL);
+    near-duplicates are yielded immediately, the rest are grouped into
+    micro-batches of batch_size so their face crops share one inference call.
+    An upload that fails (e.g. not a decodable image) yields a result with
+    verdict None and an "error" message instead of aborting the batch.
+    """
+    uploaded_files = list(uploaded_files)
+    if not uploaded_files:
+        return
+    workers = max_workers or min(len(uploaded_files), runtime.detect_pool_size())
+    pending = []
+    with runtime.pooled(workers), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_prepare, f, dedup, max_distance, max_side): i
+                   for i, f in enumerate(uploaded_files)}
+        for fut in as_completed(futures):
+            pos = futures[fut]
+            try:
+                item = fut.result()
+                dup = _duplicate_result(item) if item["match"] is not None else None
+            except Exception as e:
+                yield pos, _error_result(e)
+                continue
+            if dup is not None:
+                yield pos, dup
+                continue
+            pending.append((pos, item))
+            if len(pending) >= batch_size:
+                yield from _flush(pending, dedup)
+                pending = []
+    if pending:
+        yield from _flush(pending, dedup)
+
+
+def analyze_images(uploaded_files, **kwargs):
+    """Batch version of analyze_image; returns results in input order."""
+    uploaded_files = list(uploaded_files)
+    results = [None] * len(uploaded_files)
+    for pos, res in iter_analyze_images(uploaded_files, **kwargs):
+        results[pos] = res
+    return results
+
+
+def analyze_image(uploaded_file, dedup=True, max_distance=DEFAULT_MAX_DISTANCE, max_side=DETECT_MAX_SIDE):
+    """
+    uploaded_file: streamlit UploadedFile
+    dedup: look the image up in the perceptual-hash index first and reuse
+           the verdict of a near-duplicate (re-encode / resize) if one exists.
+    max_side: working resolution; larger photos are decoded already downscaled.
+              Face bboxes are reported in the original image_size pixel space,
+              the annotated image is drawn at working_size.
+    Returns dict:
+      { verdict, confidence, faces: [{bbox:[x,y,w,h]}], annotated_image_bytes,
+        image_size, working_size, artifacts: {score, <feature>: value},
+        analysis_id, duplicate_of: {analysis_id, distance, created_at} | None }
+    """
+    item = _prepare(uploaded_file, dedup, max_distance, max_side)
+    if item["match"] is not None:
+        return _duplicate_result(item)
+    verdict, confidence = _predict_batch([item])[0]
+    return _fresh_result(item, verdict, confidence, dedup)
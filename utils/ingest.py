@@ -0,0 +1,157 @@
+# utils/ingest.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# -------------------------------
+# LARGE-MEDIA INGESTION
+# -------------------------------
+# Uploads are streamed to disk in CHUNK_SIZE pieces (never read() whole) and
+# stored under their SHA-256, so re-uploading the same clip lands on the same
+# file and the same checkpoint directory -- that is what makes resume work.
+# Uploads and checkpoints not used for RETENTION_HOURS are deleted; save_upload
+# refreshes both whenever the same media comes back and runs the retention pass
+# at most every PRUNE_INTERVAL.
+CHUNK_SIZE = 8 * 1024 * 1024
+MEDIA_DIR = Path("media")
+UPLOAD_DIR = MEDIA_DIR / "uploads"
+CHECKPOINT_DIR = MEDIA_DIR / "checkpoints"
+RETENTION_HOURS = float(os.environ.get("DEEPSECURE_UPLOAD_HOURS", "24"))
+PRUNE_INTERVAL = 3600  # seconds between retention passes
+PART_MAX_AGE = 3600    # a .part file untouched this long belongs to an interrupted upload
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def save_upload(uploaded_file, suffix=".mp4", chunk_size=CHUNK_SIZE):
+    """
+    Stream an upload (anything with .read(n)) to UPLOAD_DIR in chunks.
+    Returns (path, sha256_hex). An existing copy with the same hash is reused.
+    """
+    maybe_prune()
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    h = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = uploaded_file.read(chunk_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+                out.write(chunk)
+        digest = h.hexdigest()
+        final = UPLOAD_DIR / f"{digest}{suffix}"
+        if final.exists():
+            os.unlink(tmp_path)
+            # back in use: restart the retention clock of the copy and its checkpoints
+            _touch(final)
+            _touch(CHECKPOINT_DIR / digest)
+        else:
+            os.replace(tmp_path, final)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return final, digest
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _last_used(path):
+    """Newest mtime of a directory and everything below it."""
+    newest = path.stat().st_mtime
+    for p in path.rglob("*"):
+        try:
+            newest = max(newest, p.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    return newest
+
+
+# -------------------------------
+# RETENTION
+# -------------------------------
+def prune(retention_hours=None):
+    """
+    Delete uploads and checkpoint directories unused for the retention period,
+    and .part files left by interrupted uploads.
+    Returns (uploads_deleted, checkpoints_deleted).
+    """
+    global _last_prune
+    hours = RETENTION_HOURS if retention_hours is None else retention_hours
+    now = time.time()
+    _last_prune = now
+    cutoff = now - hours * 3600
+    uploads = 0
+    if UPLOAD_DIR.exists():
+        for path in UPLOAD_DIR.iterdir():
+            limit = now - PART_MAX_AGE if path.suffix == ".part" else cutoff
+            try:
+                if path.is_file() and path.stat().st_mtime < limit:
+                    path.unlink()
+                    uploads += 1
+            except FileNotFoundError:
+                pass
+    checkpoints = 0
+    if CHECKPOINT_DIR.exists():
+        for path in CHECKPOINT_DIR.iterdir():
+            try:
+                if path.is_dir() and _last_used(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    checkpoints += 1
+            except FileNotFoundError:
+                pass
+    return uploads, checkpoints
+
+
+def maybe_prune():
+    """prune() if the last pass is more than PRUNE_INTERVAL ago (cheap otherwise)."""
+    with _prune_lock:
+        if time.time() - _last_prune < PRUNE_INTERVAL:
+            return None
+        return prune()
+
+
+# -------------------------------
+# PER-WINDOW CHECKPOINTS
+# -------------------------------
+def checkpoint_dir(digest, params):
+    """Directory holding the window checkpoints of one (media, parameters) pair."""
+    key = "_".join(f"{k}-{params[k]}" for k in sorted(params))
+    return CHECKPOINT_DIR / digest / key
+
+
+def load_checkpoint(ckpt_dir, window):
+    path = Path(ckpt_dir) / f"window_{window:05d}.json"
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # half-written / corrupt checkpoint: recompute that window
+        return None
+
+
+def save_checkpoint(ckpt_dir, window, data):
+    """Atomic write (temp file + rename) so a crash never leaves a partial checkpoint."""
+    ckpt_dir = Path(ckpt_dir)
+    ckpt_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=ckpt_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, ckpt_dir / f"window_{window:05d}.json")
@@ -0,0 +1,225 @@
+# utils/phash.py
+import cv2
+import numpy as np
+import sqlite3
+import threading
+import json
+import time
+from utils.sql_auth import DB_PATH
+from utils import resources
+
+# Hamming distance (out of 64 bits) under which two hashes count as the same media.
+DEFAULT_MAX_DISTANCE = 8
+# Number of evenly spaced keyframes that make up a video signature.
+VIDEO_KEYFRAMES = 5
+
+
+# -------------------------------
+# HASH FUNCTIONS
+# -------------------------------
+def phash(frame_bgr):
+    """64-bit DCT perceptual hash of a BGR frame (robust to resize / re-encode)."""
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY) if frame_bgr.ndim == 3 else frame_bgr
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # skip the DC term when taking the median so flat brightness shifts don't flip bits
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def video_signature(frames, n=VIDEO_KEYFRAMES):
+    """
+    pHash of n keyframes picked at evenly spaced positions of the clip.
+    frames: list of (frame_index, timestamp, frame_bgr) as returned by extract_frames.
+    """
+    return [phash(frames[i][2]) for i in keyframe_picks(len(frames), n)]
+
+
+def signature_from_hashes(frame_hashes, n=VIDEO_KEYFRAMES):
+    """video_signature for callers that already hashed every sampled frame."""
+    return [frame_hashes[i] for i in keyframe_picks(len(frame_hashes), n)]
+
+
+def keyframe_picks(count, n):
+    """Positions of n evenly spaced keyframes among count sampled frames (fewer if count < n)."""
+    if not count:
+        return []
+    return np.linspace(0, count - 1, num=min(n, count)).round().astype(int)
+
+
+# -------------------------------
+# BK-TREE (metric tree over Hamming distance)
+# -------------------------------
+class BKTree:
+    """Burkhard-Keller tree: lookups only visit children whose edge distance can still match."""
+
+    def __init__(self):
+        self._root = None  # [hash, item, {distance: child_node}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, h, item):
+        node = [h, item, {}]
+        self._size += 1
+        if self._root is None:
+            self._root = node
+            return
+        cur = self._root
+        while True:
+            d = hamming(h, cur[0])
+            child = cur[2].get(d)
+            if child is None:
+                cur[2][d] = node
+                return
+            cur = child
+
+    def search(self, h, max_distance):
+        """Return [(distance, item)] for all entries within max_distance, closest first."""
+        if self._root is None:
+            return []
+        out = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_distance:
+                out.append((d, node[1]))
+            lo, hi = d - max_distance, d + max_distance
+            for edge, child in node[2].items():
+                if lo <= edge <= hi:
+                    stack.append(child)
+        out.sort(key=lambda t: t[0])
+        return out
+
+
+# -------------------------------
+# PERSISTENT INDEX
+# -------------------------------
+class PerceptualHashIndex:
+    """
+    SQLite-backed store of past verdicts keyed by perceptual hash.
+    The BK-tree is rebuilt from the table on first use and kept in memory afterwards.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._trees = None        # {mode: BKTree}
+        self._signatures = {}     # analysis_id -> [hashes] (videos only)
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self, conn):
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_hashes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mode TEXT,
+            hashes TEXT,
+            result TEXT,
+            created_at INTEGER
+        );
+        """)
+        conn.commit()
+
+    def _load(self):
+        if self._trees is not None:
+            return
+        self._trees = {}
+        conn = self._get_conn()
+        self._init_db(conn)
+        rows = conn.execute("SELECT id, mode, hashes FROM media_hashes").fetchall()
+        conn.close()
+        for row in rows:
+            self._insert(row["id"], row["mode"], [int(h, 16) for h in row["hashes"].split(",")])
+
+    def _insert(self, analysis_id, mode, hashes):
+        tree = self._trees.setdefault(mode, BKTree())
+        if mode == "video":
+            # index every keyframe so a partial match still finds the candidate
+            self._signatures[analysis_id] = hashes
+            for h in hashes:
+                tree.add(h, analysis_id)
+        else:
+            tree.add(hashes[0], analysis_id)
+
+    def _fetch(self, analysis_id):
+        conn = self._get_conn()
+        row = conn.execute(
+            "SELECT id, mode, result, created_at FROM media_hashes WHERE id = ?", (analysis_id,)
+        ).fetchone()
+        conn.close()
+        if not row:
+            return None
+        return {
+            "analysis_id": row["id"],
+            "mode": row["mode"],
+            "created_at": row["created_at"],
+            "result": json.loads(row["result"]),
+        }
+
+    def lookup(self, mode, hashes, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Find the closest previous analysis of near-identical media.
+        Returns the stored entry plus its 'distance', or None.
+        For videos the distance is the mean over aligned keyframes.
+        """
+        if not hashes:
+            return None
+        with self._lock:
+            self._load()
+            tree = self._trees.get(mode)
+            if tree is None:
+                return None
+            if mode != "video":
+                hits = tree.search(hashes[0], max_distance)
+                best = (hits[0][0], hits[0][1]) if hits else None
+            else:
+                candidates = {aid for h in hashes for _, aid in tree.search(h, max_distance)}
+                best = None
+                for aid in candidates:
+                    sig = self._signatures[aid]
+                    if len(sig) != len(hashes):
+                        continue
+                    dist = sum(hamming(a, b) for a, b in zip(hashes, sig)) / len(sig)
+                    if dist <= max_distance and (best is None or dist < best[0]):
+                        best = (dist, aid)
+        if best is None:
+            return None
+        entry = self._fetch(best[1])
+        if entry is not None:
+            entry["distance"] = best[0]
+        return entry
+
+    def add(self, mode, hashes, result):
+        """Persist a new analysis and return its id."""
+        if not hashes:
+            return None
+        conn = self._get_conn()
+        self._init_db(conn)
+        cur = conn.execute(
+            "INSERT INTO media_hashes (mode, hashes, result, created_at) VALUES (?, ?, ?, ?)",
+            (mode, ",".join(f"{h:016x}" for h in hashes), json.dumps(result), int(time.time())),
+        )
+        conn.commit()
+        analysis_id = cur.lastrowid
+        conn.close()
+        with self._lock:
+            if self._trees is not None:
+                self._insert(analysis_id, mode, hashes)
+        return analysis_id
+
+
+resources.register("phash_index", PerceptualHashIndex)
+
+def get_phash_index():
+    """Process-wide index shared by every Streamlit session."""
+    return resources.get("phash_index")
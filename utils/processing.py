@@ -1,28 +1,85 @@
 # utils/processing.py
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageOps
 import io
 import math
 import tempfile
 import os
+import shutil
+from utils import resources
+
+# Longest image side the face detector works at. Larger uploads are decoded
+# straight to (roughly) this size instead of at full resolution.
+DETECT_MAX_SIDE = 1280
+
+
+# -------------------------------
+# IMAGE DECODING
+# -------------------------------
+def _upload_buffer(uploaded_file):
+    """Zero-copy view of an upload's bytes when the object supports it."""
+    if hasattr(uploaded_file, "getbuffer"):
+        return uploaded_file.getbuffer()
+    return uploaded_file.read()
+
+
+def decode_image(uploaded_file, max_side=DETECT_MAX_SIDE):
+    """
+    Decode an uploaded image to a BGR array no larger than max_side.
+    JPEGs are downscaled in the DCT domain via PIL draft() (1/2, 1/4, 1/8) so the
+    full-resolution bitmap is never materialized; EXIF orientation is applied.
+    Returns (frame_bgr, (orig_w, orig_h)).
+    """
+    img = Image.open(io.BytesIO(_upload_buffer(uploaded_file)))
+    orig_size = img.size
+    if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        orig_size = (orig_size[1], orig_size[0])  # stored sideways, shown rotated
+    if max_side and max(img.size) > max_side:
+        scale = max_side / max(img.size)
+        # draft() only picks a reduction that keeps the image >= the requested size
+        img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if max_side and max(img.size) > max_side:
+        scale = max_side / max(img.size)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                         Image.BILINEAR, reducing_gap=2.0)
+    # single copy: PIL buffer -> contiguous BGR array
+    frame = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+    return frame, orig_size
+
 
 # -------------------------------
 # FRAME EXTRACTION FROM VIDEO
 # -------------------------------
-def extract_frames(uploaded_file, fps_sample=1):
+def write_temp_video(uploaded_file):
+    """Copy an upload to a temporary file OpenCV can open; caller deletes it."""
+    # chunked copy: never hold a second full copy of the upload in memory
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
+        shutil.copyfileobj(uploaded_file, tmp, 8 * 1024 * 1024)
+        return tmp.name
+
+
+def extract_frames(uploaded_file, fps_sample=1, frame_callback=None):
     """
     Extract frames from a video every 'fps_sample' seconds.
+    frame_callback: optional fn(frame_index, frame_bgr) called for every decoded
+                    frame, sampled or not (e.g. utils.silhouette.SilhouetteStage.feed).
     Returns list of (frame_index, timestamp, frame_bgr).
     """
-    # Write to temporary file so OpenCV can read
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-        tmp.write(uploaded_file.read())
-        tmp_path = tmp.name
+    tmp_path = write_temp_video(uploaded_file)
+    try:
+        return extract_frames_at(tmp_path, fps_sample, frame_callback)
+    finally:
+        os.unlink(tmp_path)
+
 
-    cap = cv2.VideoCapture(tmp_path)
+def extract_frames_at(path, fps_sample=1, frame_callback=None):
+    """extract_frames for a video that is already on disk."""
+    cap = cv2.VideoCapture(str(path))
     if not cap.isOpened():
-        os.unlink(tmp_path)
         return []
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 25
@@ -35,16 +92,73 @@ def extract_frames(uploaded_file, fps_sample=1):
         ret, frame = cap.read()
         if not ret:
             break
+        if frame_callback is not None:
+            frame_callback(frame_index, frame)
         if frame_index % sample_interval == 0:
             timestamp = frame_index / fps
             frames.append((frame_index, timestamp, frame.copy()))
         frame_index += 1
 
     cap.release()
-    os.unlink(tmp_path)
     return frames
 
 
+def video_meta(cap):
+    """(fps, frame_count) of an open capture; frame_count is 0 when the container doesn't say."""
+    return cap.get(cv2.CAP_PROP_FPS) or 25, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+
+def seek_exact(cap, frame_index):
+    """Seek and verify; some containers only land on keyframes, then decode forward."""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    pos = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if pos == frame_index:
+        return
+    if pos > frame_index or pos < 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        pos = 0
+    for _ in range(frame_index - pos):
+        if not cap.grab():
+            break
+
+
+def read_window(cap, start_frame, end_frame, sample_interval, seek=True, frame_callback=None):
+    """
+    Decode frames [start_frame, end_frame) from an open capture, keeping every
+    sample_interval-th frame (by absolute index, same grid as extract_frames).
+    frame_callback: as in extract_frames; forces every frame to be decoded.
+    Returns (frames, eof) where frames is [(frame_index, frame_bgr)].
+    """
+    if seek:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frames = []
+    for frame_index in range(start_frame, end_frame):
+        # grab() skips the decode-to-BGR for frames we don't keep
+        if not cap.grab():
+            return frames, True
+        keep = frame_index % sample_interval == 0
+        if keep or frame_callback is not None:
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            if frame_callback is not None:
+                frame_callback(frame_index, frame)
+            if keep:
+                frames.append((frame_index, frame))
+    return frames, False
+
+
+def read_frame_at(path, frame_index):
+    """Decode a single frame of a video file on disk (used for on-demand zoom)."""
+    cap = cv2.VideoCapture(str(path))
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+
 # -------------------------------
 # CONTACT SHEET GENERATOR
 # -------------------------------
@@ -101,17 +215,18 @@ def make_contact_sheet(frames, max_cols=4, thumb_w=320):
 # -------------------------------
 # FACE DETECTION (OpenCV Haar)
 # -------------------------------
-_face_cascade = None
+def _load_face_cascade():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+# pooled: detectMultiScale is not safe to share across threads
+resources.register("face_cascade", _load_face_cascade, pooled=True)
+
 
 def detect_faces_in_frame(frame_bgr):
     """Detect faces in a given BGR frame using OpenCV Haar Cascade."""
-    global _face_cascade
-    if _face_cascade is None:
-        _face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        )
     gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    faces = _face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4)
+    with resources.borrow("face_cascade") as cascade:
+        faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4)
     return faces.tolist() if len(faces) > 0 else []
 
 
@@ -129,3 +244,31 @@ def draw_face_boxes(frame_bgr, faces):
     pil.save(buf, format="PNG")
     buf.seek(0)
     return buf
+
+
+# -------------------------------
+# THUMBNAILS / COMPACT FRAME STORAGE
+# -------------------------------
+def encode_jpeg(frame_bgr, quality=85):
+    """Compress a BGR frame to JPEG bytes (a fraction of the raw array or a PNG)."""
+    ok, enc = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return enc.tobytes() if ok else None
+
+
+def decode_jpeg(data):
+    """Inverse of encode_jpeg."""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def make_thumbnail(frame_bgr, faces, width=160):
+    """Small JPEG of a frame with its face boxes drawn, for list views."""
+    h, w = frame_bgr.shape[:2]
+    scale = width / w
+    thumb = cv2.resize(frame_bgr, (width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    for (x, y, fw, fh) in faces:
+        cv2.rectangle(thumb, (int(x * scale), int(y * scale)),
+                      (int((x + fw) * scale), int((y + fh) * scale)), (0, 0, 255), 1)
+    buf = io.BytesIO(encode_jpeg(thumb, quality=75))
+    buf.seek(0)
+    return buf
+
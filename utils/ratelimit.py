@@ -0,0 +1,250 @@
+# utils/ratelimit.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# SLIDING-WINDOW RATE LIMITER
+# -------------------------------
+# Sliding-window counter: each key keeps the count of the current fixed window
+# and of the previous one, and the estimate weights the previous count by how
+# much of it still overlaps the sliding window. O(1) per hit and per key, no
+# timestamp lists. Keys live in an OrderedDict by last use, so stale buckets
+# (idle for two windows) are dropped from the front and the table never grows
+# past max_keys.
+
+
+def _release(b):
+    # the hit may have rolled into the previous window since it was counted
+    if b[2] > 0:
+        b[2] -= 1
+    elif b[1] > 0:
+        b[1] -= 1
+
+
+class SlidingWindowLimiter:
+    """In-process limiter: at most `limit` hits per `window` seconds per key."""
+
+    def __init__(self, limit, window, max_keys=100_000, clock=time.monotonic):
+        self.limit = limit
+        self.window = float(window)
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> [window_start, prev_count, cur_count]
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, now):
+        start = now - (now % self.window)
+        b = self._buckets.get(key)
+        if b is None:
+            b = self._buckets[key] = [start, 0, 0]
+        elif b[0] != start:
+            # roll forward; anything older than the previous window counts as zero
+            b[1] = b[2] if start - b[0] == self.window else 0
+            b[2] = 0
+            b[0] = start
+        self._buckets.move_to_end(key)
+        return b
+
+    def _estimate(self, b, now):
+        overlap = 1.0 - (now - b[0]) / self.window
+        return b[1] * overlap + b[2]
+
+    def _wait(self, b, now):
+        if b[2] >= self.limit:
+            # after the rollover the current count becomes the decaying previous one
+            return b[0] + self.window * (2 - self.limit / b[2]) - now
+        # previous window's weight must decay until the estimate drops below limit
+        need = (b[1] + b[2] - self.limit) / b[1] * self.window
+        return max(0.0, b[0] + need - now)
+
+    def _expire(self, now):
+        # front of the OrderedDict is the least recently used key
+        while self._buckets:
+            key, b = next(iter(self._buckets.items()))
+            if now - b[0] < 2 * self.window and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+    def allow(self, key):
+        """Whether one more hit would stay under the limit (does not count it)."""
+        with self._lock:
+            now = self._clock()
+            b = self._buckets.get(key)
+            if b is None:
+                return True
+            return self._estimate(self._bucket(key, now), now) < self.limit
+
+    def hit(self, key):
+        """Count a hit; returns True if it was within the limit."""
+        with self._lock:
+            now = self._clock()
+            b = self._bucket(key, now)
+            allowed = self._estimate(b, now) < self.limit
+            b[2] += 1
+            self._expire(now)
+            return allowed
+
+    def release(self, key):
+        """Take back one hit counted by hit() (e.g. an attempt that turned out not to count)."""
+        with self._lock:
+            now = self._clock()
+            if key in self._buckets:
+                _release(self._bucket(key, now))
+
+    def retry_after(self, key):
+        """Seconds until the next hit for key would be allowed (0 if it already is)."""
+        with self._lock:
+            now = self._clock()
+            b = self._buckets.get(key)
+            if b is None:
+                return 0.0
+            b = self._bucket(key, now)
+            if self._estimate(b, now) < self.limit:
+                return 0.0
+            return self._wait(b, now)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteSlidingWindowLimiter(SlidingWindowLimiter):
+    """
+    Same algorithm with the buckets in a SQLite table, so limits are shared by
+    several server processes and survive restarts. Uses wall-clock time.
+    """
+
+    def __init__(self, limit, window, db_path, table="rate_limits", max_keys=100_000):
+        super().__init__(limit, window, max_keys=max_keys, clock=time.time)
+        self.db_path = db_path
+        self.table = table
+        conn = self._conn()
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            key TEXT PRIMARY KEY,
+            window_start REAL,
+            prev_count INTEGER,
+            cur_count INTEGER
+        );
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_window ON {table}(window_start);")
+        conn.commit()
+        conn.close()
+
+    def _conn(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _load(self, conn, key, now):
+        row = conn.execute(f"SELECT window_start, prev_count, cur_count FROM {self.table} WHERE key = ?",
+                           (key,)).fetchone()
+        start = now - (now % self.window)
+        if row is None:
+            return [start, 0, 0]
+        b = list(row)
+        if b[0] != start:
+            b[1] = b[2] if start - b[0] == self.window else 0
+            b[2] = 0
+            b[0] = start
+        return b
+
+    def allow(self, key):
+        now = self._clock()
+        conn = self._conn()
+        try:
+            return self._estimate(self._load(conn, key, now), now) < self.limit
+        finally:
+            conn.close()
+
+    def hit(self, key):
+        now = self._clock()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            b = self._load(conn, key, now)
+            allowed = self._estimate(b, now) < self.limit
+            b[2] += 1
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, window_start, prev_count, cur_count) "
+                         f"VALUES (?, ?, ?, ?)", (key, b[0], b[1], b[2]))
+            # expiry by index range scan, not a table walk
+            conn.execute(f"DELETE FROM {self.table} WHERE window_start < ?", (now - 2 * self.window,))
+            conn.commit()
+            return allowed
+        finally:
+            conn.close()
+
+    def release(self, key):
+        now = self._clock()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                b = self._load(conn, key, now)
+                _release(b)
+                conn.execute(f"UPDATE {self.table} SET window_start = ?, prev_count = ?, cur_count = ? "
+                             f"WHERE key = ?", (b[0], b[1], b[2], key))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def retry_after(self, key):
+        now = self._clock()
+        conn = self._conn()
+        try:
+            b = self._load(conn, key, now)
+        finally:
+            conn.close()
+        if self._estimate(b, now) < self.limit:
+            return 0.0
+        return self._wait(b, now)
+
+    def __len__(self):
+        conn = self._conn()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
+
+
+# -------------------------------
+# TTL CACHE (verified sessions)
+# -------------------------------
+class TTLCache:
+    """Bounded LRU whose entries expire `ttl` seconds after they were last refreshed."""
+
+    def __init__(self, ttl, max_entries=10_000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._items = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (self._clock() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def get(self, key, refresh=True):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            now = self._clock()
+            if entry[0] <= now:
+                del self._items[key]
+                return None
+            if refresh:
+                self._items[key] = (now + self.ttl, entry[1])
+                self._items.move_to_end(key)
+            return entry[1]
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._items.pop(key, None)
+            return entry[1] if entry else None
+
+    def __len__(self):
+        return len(self._items)
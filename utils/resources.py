@@ -0,0 +1,98 @@
+# utils/resources.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# -------------------------------
+# PROCESS-WIDE RESOURCE REGISTRY
+# -------------------------------
+# Detectors, indexes and (later) models are expensive to build, so each one is
+# registered here with a factory and built once per process on first use --
+# or ahead of time by warmup(). Resources that must not be used by two threads
+# at once (e.g. the Haar cascade) are registered pooled=True and handed out
+# with borrow(); idle instances are kept for the next caller, so Streamlit's
+# per-rerun script threads and worker pools never rebuild them.
+
+_factories = {}      # name -> (factory, pooled)
+_instances = {}      # name -> object (shared resources)
+_pools = {}          # name -> [idle instances] (pooled resources)
+_lock = threading.Lock()
+_warmup_report = {}  # name -> seconds spent building during warmup
+
+
+def register(name, factory, pooled=False):
+    """Declare a resource; nothing is built until it is first used or warmed up."""
+    with _lock:
+        _factories[name] = (factory, pooled)
+        if pooled:
+            _pools.setdefault(name, [])
+
+
+def get(name):
+    """Return the process-wide instance of a shared resource."""
+    inst = _instances.get(name)
+    if inst is None:
+        with _lock:
+            inst = _instances.get(name)
+            if inst is None:
+                inst = _instances[name] = _factories[name][0]()
+    return inst
+
+
+def discard(name, inst):
+    """Forget a shared instance (e.g. a broken pool) so the next get() builds a new one."""
+    with _lock:
+        if _instances.get(name) is inst:
+            del _instances[name]
+
+
+@contextmanager
+def borrow(name):
+    """Exclusive use of one instance of a pooled resource for the duration of the block."""
+    factory, pooled = _factories[name]
+    if not pooled:
+        yield get(name)
+        return
+    with _lock:
+        idle = _pools[name]
+        inst = idle.pop() if idle else None
+    if inst is None:
+        inst = factory()
+    try:
+        yield inst
+    finally:
+        with _lock:
+            _pools[name].append(inst)
+
+
+def warmup(names=None):
+    """
+    Build resources ahead of the first request (heavy imports included).
+    Pooled resources get one idle instance. Returns {name: build_seconds}.
+    """
+    # importing the model modules registers their resources
+    import utils.image_model  # noqa: F401
+    import utils.video_model  # noqa: F401
+    for name in names or list(_factories):
+        factory, pooled = _factories[name]
+        t0 = time.perf_counter()
+        if pooled:
+            inst = factory()
+            with _lock:
+                _pools[name].append(inst)
+        else:
+            get(name)
+        _warmup_report[name] = time.perf_counter() - t0
+    if os.environ.get("DEEPSECURE_AUTOTUNE", "1") == "1":
+        # pick OpenCV threads vs. pool width from a measurement (see utils.runtime)
+        from utils import runtime
+        t0 = time.perf_counter()
+        runtime.autotune()
+        _warmup_report["autotune_detect"] = time.perf_counter() - t0
+    return dict(_warmup_report)
+
+
+def warmup_report():
+    """Build times recorded by the last warmup() call."""
+    return dict(_warmup_report)
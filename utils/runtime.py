@@ -0,0 +1,210 @@
+# utils/runtime.py
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# -------------------------------
+# CPU BUDGET & THREADING POLICY
+# -------------------------------
+# Containers often get a CFS quota smaller than the host's core count, and
+# os.cpu_count() reports the host. Every pool in the app sizes itself from
+# available_cpus() instead, and the per-call parallelism of OpenCV / BLAS is
+# chosen together with those pools so that pool_workers x library_threads
+# stays within the budget:
+#   - thread pools that run detection: detect_pool_size() workers, run inside
+#     pooled() so each detectMultiScale uses cv2 threads (1 until autotune()
+#     says otherwise) and BLAS one thread
+#   - worker processes (segments, shared-memory detection): one per CPU,
+#     single-threaded inside (configure_worker)
+#   - a single caller (one image, sequential video decode): nothing is limited,
+#     OpenCV / BLAS keep their own defaults and use the whole budget for latency
+# This module imports nothing heavy at module level so app.py can use it.
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+AUTOTUNE_FRAME = (720, 1280)  # (h, w): detector working size for full-HD input
+AUTOTUNE_REPEAT = 2           # frames per pool worker per candidate
+TIE_TOLERANCE = 0.05          # within 5% throughput, prefer more threads per call (lower latency)
+
+_lock = threading.Lock()
+_config = {}
+_pooled = {"depth": 0, "cv2_default": None, "blas": None}
+
+
+def cgroup_cpu_limit():
+    """CPUs allowed by the cgroup (v2 cpu.max or v1 cfs quota), or None when unlimited / unknown."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus():
+    """Usable CPUs: affinity mask capped by the cgroup quota (rounded up), at least 1."""
+    cpus = _config.get("cpus")
+    if cpus is None:
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            cpus = os.cpu_count() or 1
+        limit = cgroup_cpu_limit()
+        if limit:
+            cpus = min(cpus, math.ceil(limit))
+        cpus = _config["cpus"] = max(1, cpus)
+    return cpus
+
+
+def detect_pool_size():
+    """Thread-pool workers for detection so that workers x cv2 threads fits the CPU budget."""
+    return max(1, available_cpus() // _config.get("cv2_threads", 1))
+
+
+def _limit_blas(n):
+    # env vars reach spawned workers and libraries not loaded yet; threadpoolctl
+    # (ships with scikit-learn) also resizes pools that are already running
+    for var in BLAS_ENV_VARS:
+        os.environ.setdefault(var, str(n))
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(n)
+    except ImportError:
+        pass
+
+
+def configure(cv2_threads=None):
+    """
+    Record the threading policy for in-process pools (idempotent; cheap).
+    Nothing changes for serial callers until a pool enters pooled();
+    autotune() calls this with the cv2_threads it measured best.
+    """
+    import cv2
+    with _lock:
+        cpus = available_cpus()
+        threads = cv2_threads or _config.get("cv2_threads", 1)
+        if _pooled["depth"]:
+            cv2.setNumThreads(threads)
+        _config.update({
+            "cpus": cpus,
+            "cgroup_limit": cgroup_cpu_limit(),
+            "cv2_threads": threads,
+            "cv2_default_threads": _pooled["cv2_default"] or cv2.getNumThreads(),
+            "cv2_optimized": cv2.useOptimized(),
+            "detect_pool": max(1, cpus // threads),
+        })
+    return dict(_config)
+
+
+@contextmanager
+def pooled(workers):
+    """
+    Threading policy while `workers` detection calls run concurrently in this
+    process: cv2 threads per call from configure() / autotune(), BLAS one thread.
+    Nests and overlaps across pools; the library defaults come back when the
+    last one exits. A single worker is a serial caller and changes nothing.
+    """
+    if workers <= 1:
+        yield
+        return
+    import cv2
+    configure()
+    with _lock:
+        if _pooled["depth"] == 0:
+            _pooled["cv2_default"] = cv2.getNumThreads()
+            cv2.setNumThreads(_config["cv2_threads"])
+            try:
+                from threadpoolctl import threadpool_limits
+                _pooled["blas"] = threadpool_limits(1)
+            except ImportError:
+                _pooled["blas"] = None
+        _pooled["depth"] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _pooled["depth"] -= 1
+            if _pooled["depth"] == 0:
+                cv2.setNumThreads(_pooled["cv2_default"])
+                if _pooled["blas"] is not None:
+                    _pooled["blas"].restore_original_limits()
+                _pooled["blas"] = None
+
+
+def configure_worker():
+    """Initializer for worker processes: one process per CPU, single-threaded inside."""
+    import cv2
+    _limit_blas(1)
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(1)
+
+
+def _candidates(cpus):
+    out, t = [], 1
+    while t < cpus:
+        out.append(t)
+        t *= 2
+    return out + [cpus]
+
+
+def autotune(candidates=None, frame=None, repeat=AUTOTUNE_REPEAT):
+    """
+    Measure detect_faces_in_frame throughput with the CPU budget split as
+    (cpus // t) concurrent calls x t OpenCV threads for each candidate t, and
+    keep the best for pooled(). Serial callers are not tuned here: they keep
+    OpenCV's default thread count. Returns the report stored in report()["autotune"].
+    """
+    import cv2
+    import numpy as np
+    from utils.processing import detect_faces_in_frame
+
+    cpus = available_cpus()
+    if frame is None:
+        # textured, deterministic stand-in for a frame: the cascade's cost depends
+        # on size and on how many windows survive the early stages, not on content
+        rng = np.random.default_rng(0)
+        frame = cv2.GaussianBlur(rng.integers(0, 256, (*AUTOTUNE_FRAME, 3), dtype=np.uint8), (7, 7), 0)
+    detect_faces_in_frame(frame)  # build the cascade outside the timing
+
+    results = {}
+    before = cv2.getNumThreads()
+    try:
+        for t in candidates or _candidates(cpus):
+            cv2.setNumThreads(t)
+            workers = max(1, cpus // t)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                t0 = time.perf_counter()
+                list(pool.map(lambda _: detect_faces_in_frame(frame), range(workers * repeat)))
+                elapsed = time.perf_counter() - t0
+            results[t] = {"workers": workers, "fps": workers * repeat / elapsed,
+                          "latency_ms": elapsed / repeat * 1000}
+    finally:
+        cv2.setNumThreads(before)
+
+    top = max(r["fps"] for r in results.values())
+    best = max(t for t, r in results.items() if r["fps"] >= top * (1 - TIE_TOLERANCE))
+    configure(cv2_threads=best)
+    report = {"chosen_cv2_threads": best, "detect_pool": detect_pool_size(),
+              "candidates": {str(t): {k: round(v, 2) for k, v in r.items()} for t, r in results.items()}}
+    with _lock:
+        _config["autotune"] = report
+    return report
+
+
+def report():
+    """Current runtime configuration (and autotune results once it has run)."""
+    return configure()
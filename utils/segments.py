@@ -0,0 +1,138 @@
+# utils/segments.py
+import sys
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+from utils import resources, runtime
+from utils.processing import detect_faces_in_frame, read_window, video_meta, make_thumbnail, seek_exact
+from utils.phash import phash
+from utils.artifacts import clip_features
+from utils.silhouette import SilhouetteStage, merge_summaries
+
+# -------------------------------
+# SEGMENT-PARALLEL VIDEO DECODING
+# -------------------------------
+# A clip is cut into N time segments; each worker process opens its own
+# capture, seeks to its segment and decodes + detects there. Segment starts
+# sit on the sampling grid (multiples of sample_interval) and frames are kept
+# by absolute index, so the union of all segments is exactly the set of frames
+# a single sequential pass would sample -- nothing duplicated or dropped at the
+# boundaries. The last segment reads to EOF in case the container's frame count
+# is short.
+
+# Below this many sampled frames per worker the process start-up isn't worth it.
+MIN_SAMPLES_PER_SEGMENT = 8
+
+
+def _init_worker():
+    # one decode per core already; OpenCV's own thread pool would oversubscribe
+    runtime.configure_worker()
+
+
+def _make_pool():
+    # spawn: forking a process that runs Streamlit's threads is not safe
+    return ProcessPoolExecutor(max_workers=runtime.available_cpus(),
+                               mp_context=mp.get_context("spawn"), initializer=_init_worker)
+
+resources.register("video_pool", _make_pool)
+
+
+def plan_segments(total_frames, n_segments, sample_interval):
+    """
+    [(start, end)] frame ranges; starts are multiples of sample_interval, last end
+    is open. An unknown frame count (0) gives one segment over the whole clip.
+    """
+    if not total_frames:
+        return [(0, sys.maxsize)]
+    samples = -(-total_frames // sample_interval)
+    n_segments = max(1, min(n_segments, samples // MIN_SAMPLES_PER_SEGMENT or 1))
+    per = -(-samples // n_segments)
+    starts = [s for s in (i * per * sample_interval for i in range(n_segments)) if s < total_frames]
+    return [(start, starts[i + 1] if i + 1 < len(starts) else sys.maxsize) for i, start in enumerate(starts)]
+
+
+def analyze_segment(path, start, end, sample_interval, silhouettes=False):
+    """
+    Worker: decode [start, end) of the video at path and detect faces on sampled frames.
+    Returns (records, gait): compact, picklable per-frame records (JPEGs, not
+    arrays) and, with silhouettes, the segment's SilhouetteStage.summary() (else None).
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        return [], None
+    stage = SilhouetteStage() if silhouettes else None
+    try:
+        fps, _ = video_meta(cap)
+        seek_exact(cap, start)
+        frames, _ = read_window(cap, start, end, sample_interval, seek=False, frame_callback=stage and stage.feed)
+    finally:
+        cap.release()
+    return [frame_record(idx, idx / fps, frame) for idx, frame in frames], stage and stage.summary()
+
+
+def frame_record(idx, ts, frame):
+    """Detect faces on one frame and reduce it to a compact, picklable record."""
+    faces = [[int(x), int(y), int(w), int(h)] for (x, y, w, h) in detect_faces_in_frame(frame)]
+    h, w = frame.shape[:2]
+    per_frame, luma = clip_features([(frame, faces)])
+    return {
+        "index": int(idx),
+        "timestamp": float(ts),
+        "faces": faces,
+        "thumbnail": make_thumbnail(frame, faces),
+        "sheet_frame": cv2.resize(frame, (320, max(1, int(320 * h / w))), interpolation=cv2.INTER_AREA),
+        "phash": phash(frame),
+        "size": (w, h),
+        "artifacts": per_frame[0].tolist(),
+        "luma": float(luma[0]),
+    }
+
+
+def _run_segments(path, segments, sample_interval, silhouettes, attempts=2):
+    """
+    analyze_segment for every segment in the shared pool. A worker that dies
+    (OOM kill, segfault in a codec) breaks the whole executor for good, so a
+    broken pool is dropped and rebuilt, and the clip retried once on the new one.
+    """
+    for attempt in range(attempts):
+        pool = resources.get("video_pool")
+        try:
+            futures = [pool.submit(analyze_segment, path, start, end, sample_interval, silhouettes)
+                       for start, end in segments]
+            return [fut.result() for fut in futures]
+        except BrokenProcessPool:
+            resources.discard("video_pool", pool)
+            pool.shutdown(wait=False, cancel_futures=True)
+            if attempt + 1 == attempts:
+                raise
+
+
+def analyze_segments(path, sample_seconds=1, n_segments=None, silhouettes=False):
+    """
+    Run analyze_segment over N segments of the video at path in the shared
+    process pool and merge the records in timestamp order.
+    Returns (records, n_segments_used, gait) -- gait is the merged silhouette
+    result (see utils.silhouette.merge_summaries) with silhouettes, else None.
+    Falls back to one in-process segment when the frame count is unknown or
+    the clip is too short to split.
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        return [], 0, None
+    fps, total = video_meta(cap)
+    cap.release()
+    sample_interval = max(1, int(fps * sample_seconds))
+    n_segments = n_segments or runtime.available_cpus()
+    segments = plan_segments(total, n_segments, sample_interval)
+    if len(segments) == 1:
+        parts = [analyze_segment(path, 0, sys.maxsize, sample_interval, silhouettes)]
+    else:
+        parts = _run_segments(str(path), segments, sample_interval, silhouettes)
+    merged = {}
+    for records, _ in parts:
+        for rec in records:
+            merged[rec["index"]] = rec  # keyed by absolute index: a boundary frame can't appear twice
+    # each segment's stage warms up its own background model; segments are in time order
+    gait = merge_summaries(g for _, g in parts if g) if silhouettes else None
+    return [merged[i] for i in sorted(merged)], len(segments), gait
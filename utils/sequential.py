@@ -0,0 +1,70 @@
+# utils/sequential.py
+import math
+import time
+
+# -------------------------------
+# SEQUENTIAL (EARLY-EXIT) VERDICTS
+# -------------------------------
+# Per-frame deepfake probabilities are folded into a running mean / variance
+# (Welford) as frames arrive. Once enough frames are in, a normal-approximation
+# interval around the mean decides whether more frames could still change the
+# verdict: if it lies entirely on one side of 0.5, or has become narrower than
+# half_width, decoding stops. Frame and wall-clock budgets bound the worst case.
+MIN_FRAMES = 8
+Z = 1.96             # ~95% interval
+HALF_WIDTH = 0.05    # stop when the mean is known to +-5 points even if it straddles 0.5
+
+
+class RunningVerdict:
+    """Running aggregate of per-frame scores in [0, 1] with a stopping rule."""
+
+    def __init__(self, min_frames=MIN_FRAMES, z=Z, half_width=HALF_WIDTH,
+                 max_frames=None, time_budget=None, threshold=0.5):
+        self.min_frames = min_frames
+        self.z = z
+        self.half_width = half_width
+        self.max_frames = max_frames
+        self.time_budget = time_budget
+        self.threshold = threshold
+        self.n = 0            # frames that contributed a score
+        self.seen = 0         # frames decoded (with or without a face)
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._t0 = time.perf_counter()
+
+    def add(self, score):
+        """Fold in one frame; score=None for frames without evidence (no face)."""
+        self.seen += 1
+        if score is None:
+            return
+        self.n += 1
+        delta = score - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (score - self.mean)
+
+    def interval(self):
+        """(low, high) around the mean; (0, 1) until two scores are in."""
+        if self.n < 2:
+            return 0.0, 1.0
+        sd = math.sqrt(self._m2 / (self.n - 1))
+        hw = self.z * sd / math.sqrt(self.n)
+        return max(0.0, self.mean - hw), min(1.0, self.mean + hw)
+
+    def stop_reason(self):
+        """Why decoding should stop now, or None to keep going."""
+        if self.n >= self.min_frames:
+            lo, hi = self.interval()
+            if lo > self.threshold or hi < self.threshold:
+                return "decided"
+            if (hi - lo) / 2 <= self.half_width:
+                return "converged"
+        if self.max_frames and self.seen >= self.max_frames:
+            return "frame_budget"
+        if self.time_budget and time.perf_counter() - self._t0 >= self.time_budget:
+            return "time_budget"
+        return None
+
+    def summary(self, reason):
+        lo, hi = self.interval()
+        return {"frames_used": self.n, "frames_decoded": self.seen, "stopped": reason,
+                "score_mean": self.mean, "score_interval": [lo, hi]}
@@ -0,0 +1,119 @@
+# utils/session_cache.py
+import hashlib
+import io
+from collections import OrderedDict
+
+# -------------------------------
+# PER-SESSION RESULT MEMOIZATION
+# -------------------------------
+# Every widget interaction reruns app.py top to bottom, so analysis results
+# have to live in session state to survive a "Zoom" click. They are kept in an
+# LRU keyed by (mode, upload identity, parameters) and capped in bytes per
+# session; the least recently viewed results are evicted first. The result each
+# mode is currently showing is pinned: it is never evicted (even when it alone
+# exceeds the cap), so a large clip still renders and survives reruns.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def upload_key(uploaded_file):
+    """Stable identity of an upload across reruns (Streamlit file_id, else content hash)."""
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id:
+        return f"id:{file_id}"
+    if hasattr(uploaded_file, "getbuffer"):
+        return "sha1:" + hashlib.sha1(uploaded_file.getbuffer()).hexdigest()
+    pos = uploaded_file.tell()
+    h = hashlib.sha1()
+    uploaded_file.seek(0)
+    for chunk in iter(lambda: uploaded_file.read(1 << 20), b""):
+        h.update(chunk)
+    uploaded_file.seek(pos)
+    return "sha1:" + h.hexdigest()
+
+
+def text_key(text):
+    return "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def estimate_size(obj):
+    """Approximate retained bytes of a result (payload buffers dominate)."""
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, io.BytesIO):
+        return obj.getbuffer().nbytes
+    if isinstance(obj, str):
+        return len(obj)
+    if isinstance(obj, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in obj)
+    nbytes = getattr(obj, "nbytes", None)  # numpy arrays
+    if isinstance(nbytes, int):
+        return nbytes
+    return 32
+
+
+class ResultCache:
+    """Byte-capped LRU of analysis results for one session."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (result, size)
+        self._pinned = set()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, result, pinned=False):
+        """
+        Store a result; pinned results are never evicted (only other entries
+        make room for them). Returns False if an unpinned result alone exceeds
+        the cap (not stored).
+        """
+        size = estimate_size(result)
+        if key in self._items:
+            self.total_bytes -= self._items.pop(key)[1]
+        if size > self.max_bytes and not pinned:
+            return False
+        self._items[key] = (result, size)
+        self.total_bytes += size
+        if pinned:
+            self._pinned.add(key)
+        self._evict()
+        return True
+
+    def unpin(self, key):
+        """Make a pinned result evictable again (it stays cached while it fits)."""
+        self._pinned.discard(key)
+        self._evict()
+
+    def _evict(self):
+        for key in list(self._items):  # least recently used first
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self.total_bytes -= self._items.pop(key)[1]
+            self.evictions += 1
+
+    def stats(self):
+        return {"entries": len(self._items), "pinned": len(self._pinned), "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
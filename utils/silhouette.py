@@ -0,0 +1,183 @@
+# utils/silhouette.py
+import base64
+import io
+import cv2
+import numpy as np
+
+# -------------------------------
+# SILHOUETTES & GAIT ENERGY IMAGE
+# -------------------------------
+# Background subtraction needs every frame (the model learns the background
+# from them), so this stage is fed from inside the decode loop rather than
+# from the sampled frames. Frames are shrunk to WORK_WIDTH first; the
+# foreground mask is cleaned, the largest blob is cropped, scaled to a fixed
+# height and centred on its horizontal centroid (the usual GEI alignment).
+# Each aligned silhouette updates a running-mean Gait Energy Image and is kept
+# bit-packed in a fixed ring, so memory does not grow with clip length.
+# A clip decoded in pieces (segments in worker processes, checkpointed windows)
+# gets one stage per piece; their summary()s are combined by merge_summaries.
+WORK_WIDTH = 160
+SIL_SIZE = (64, 44)        # (height, width) of normalized silhouettes
+MIN_AREA = 0.01            # blob must cover this fraction of the work frame
+WARMUP_FRAMES = 10         # frames the background model needs before masks mean anything
+MAX_SILHOUETTES = 256      # packed silhouettes kept (most recent)
+
+
+class SilhouetteStage:
+    """
+    Incremental silhouette extractor. Call feed(frame_index, frame_bgr) for
+    every decoded frame, then result().
+    """
+
+    def __init__(self, method="MOG2", work_width=WORK_WIDTH, size=SIL_SIZE, min_area=MIN_AREA,
+                 warmup=WARMUP_FRAMES, max_keep=MAX_SILHOUETTES):
+        if method == "KNN":
+            self.subtractor = cv2.createBackgroundSubtractorKNN(detectShadows=True)
+        else:
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=True)
+        self.method = method
+        self.work_width = work_width
+        self.size = size
+        self.min_area = min_area
+        self.warmup = warmup
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self._packed_len = (size[0] * size[1] + 7) // 8
+        self._ring = np.zeros((max_keep, self._packed_len), np.uint8)
+        self._ring_idx = np.full(max_keep, -1, np.int64)
+        self._aligned = np.zeros(size, np.uint8)
+        self.gei = np.zeros(size, np.float32)
+        self.count = 0      # silhouettes accumulated into the GEI
+        self.frames = 0     # frames fed
+
+    def _mask(self, frame):
+        h, w = frame.shape[:2]
+        if w > self.work_width:
+            frame = cv2.resize(frame, (self.work_width, max(1, round(h * self.work_width / w))),
+                               interpolation=cv2.INTER_AREA)
+        mask = self.subtractor.apply(frame)
+        # shadows are 127 in both subtractors' output; keep only confident foreground
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._kernel)
+
+    def _align(self, mask):
+        """Largest blob cropped, scaled to the target height and centred on its centroid column."""
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if n < 2:
+            return None
+        best = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        x, y, w, h, area = stats[best]
+        if area < self.min_area * mask.size or h < 4:
+            return None
+        blob = (labels[y:y + h, x:x + w] == best).astype(np.uint8)
+        out_h, out_w = self.size
+        new_w = max(1, round(w * out_h / h))
+        blob = cv2.resize(blob, (new_w, out_h), interpolation=cv2.INTER_NEAREST)
+        cols = blob.sum(axis=0)
+        cx = int(round((cols * np.arange(new_w)).sum() / max(cols.sum(), 1)))
+        aligned = self._aligned
+        aligned[:] = 0
+        # paste so the centroid column lands in the middle, clipping what falls outside
+        off = out_w // 2 - cx
+        src0, dst0 = max(0, -off), max(0, off)
+        width = min(new_w - src0, out_w - dst0)
+        if width > 0:
+            aligned[:, dst0:dst0 + width] = blob[:, src0:src0 + width]
+        return aligned
+
+    def feed(self, frame_index, frame):
+        self.frames += 1
+        mask = self._mask(frame)
+        if self.frames <= self.warmup:
+            return
+        sil = self._align(mask)
+        if sil is None:
+            return
+        self.count += 1
+        # running mean: no per-frame history needed for the GEI
+        self.gei += (sil - self.gei) / self.count
+        slot = (self.count - 1) % len(self._ring)
+        self._ring[slot] = np.packbits(sil, axis=None)
+        self._ring_idx[slot] = frame_index
+
+    def silhouettes(self):
+        """(packed (N, bytes) oldest first, frame indices (N,)) of the kept silhouettes."""
+        keep = min(self.count, len(self._ring))
+        if self.count <= len(self._ring):
+            order = np.arange(keep)
+        else:
+            start = self.count % len(self._ring)
+            order = np.roll(np.arange(len(self._ring)), -start)
+        return self._ring[order].copy(), self._ring_idx[order].copy()
+
+    def result(self):
+        packed, indices = self.silhouettes()
+        return {
+            "method": self.method,
+            "frames": self.frames,
+            "silhouette_count": self.count,
+            "size": list(self.size),
+            "silhouettes": packed,
+            "silhouette_frames": indices,
+            "gei": self.gei.copy(),
+            "gei_image": gei_png(self.gei) if self.count else None,
+        }
+
+    def summary(self):
+        """JSON-able state of this stage (GEI, counts, kept silhouettes) for merge_summaries."""
+        packed, indices = self.silhouettes()
+        return {
+            "method": self.method,
+            "frames": self.frames,
+            "silhouette_count": self.count,
+            "size": list(self.size),
+            "gei": base64.b64encode(self.gei.astype(np.float32).tobytes()).decode("ascii"),
+            "silhouettes": base64.b64encode(packed.tobytes()).decode("ascii"),
+            "silhouette_frames": indices.tolist(),
+        }
+
+
+def merge_summaries(summaries, max_keep=MAX_SILHOUETTES):
+    """
+    SilhouetteStage.result() for a clip whose pieces each had their own stage,
+    from their summary()s in time order: the GEI is the count-weighted mean and
+    the most recent max_keep silhouettes are kept.
+    """
+    summaries = list(summaries)
+    size = tuple(summaries[0]["size"]) if summaries else SIL_SIZE
+    packed_len = (size[0] * size[1] + 7) // 8
+    count = sum(s["silhouette_count"] for s in summaries)
+    gei = np.zeros(size, np.float32)
+    for s in summaries:
+        if s["silhouette_count"]:
+            gei += np.frombuffer(base64.b64decode(s["gei"]), np.float32).reshape(size) * s["silhouette_count"]
+    if count:
+        gei /= count
+    packed = np.concatenate([np.frombuffer(base64.b64decode(s["silhouettes"]), np.uint8).reshape(-1, packed_len)
+                             for s in summaries] or [np.zeros((0, packed_len), np.uint8)])
+    indices = np.concatenate([np.asarray(s["silhouette_frames"], np.int64) for s in summaries]
+                             or [np.zeros(0, np.int64)])
+    return {
+        "method": summaries[0]["method"] if summaries else "MOG2",
+        "frames": sum(s["frames"] for s in summaries),
+        "silhouette_count": count,
+        "size": list(size),
+        "silhouettes": packed[-max_keep:].copy(),
+        "silhouette_frames": indices[-max_keep:].copy(),
+        "gei": gei,
+        "gei_image": gei_png(gei) if count else None,
+    }
+
+
+def unpack_silhouettes(packed, size=SIL_SIZE):
+    """Bit-packed silhouettes back to (N, H, W) uint8 {0, 1}."""
+    n_bits = size[0] * size[1]
+    return np.unpackbits(packed, axis=1)[:, :n_bits].reshape(len(packed), *size)
+
+
+def gei_png(gei, scale=4):
+    """The Gait Energy Image as an upscaled grayscale PNG (BytesIO)."""
+    img = (np.clip(gei, 0, 1) * 255).astype(np.uint8)
+    img = cv2.resize(img, (img.shape[1] * scale, img.shape[0] * scale), interpolation=cv2.INTER_NEAREST)
+    ok, buf = cv2.imencode(".png", img)
+    return io.BytesIO(buf.tobytes()) if ok else None
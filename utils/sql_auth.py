@@ -2,8 +2,10 @@
 import sqlite3
 from pathlib import Path
 import hashlib
+import os
 import secrets
 import time
+from utils.ratelimit import SlidingWindowLimiter, SQLiteSlidingWindowLimiter, TTLCache
 
 # -----------------------------
 # Database location
@@ -102,6 +104,74 @@ def authenticate_user(email: str, password: str):
     else:
         return False, "Invalid credentials."
 
+# -----------------------------
+# Login throttling & verified sessions
+# -----------------------------
+# Failed logins are limited per email (password guessing) and all attempts per
+# client (credential stuffing across many emails). Set DEEPSECURE_RATELIMIT=sqlite
+# to keep the counters in users.db so several server processes share them.
+LOGIN_FAILS_PER_EMAIL = (5, 300)      # (limit, window seconds)
+LOGIN_ATTEMPTS_PER_CLIENT = (20, 60)
+# A successful login issues a token; while it is cached, reruns of that session
+# are trusted without touching the database or re-hashing the password.
+SESSION_TTL = 30 * 60
+SESSION_MAX_ENTRIES = 10_000
+
+
+def _make_limiter(limit, window, table):
+    if os.environ.get("DEEPSECURE_RATELIMIT", "memory") == "sqlite":
+        return SQLiteSlidingWindowLimiter(limit, window, DB_PATH, table=table)
+    return SlidingWindowLimiter(limit, window)
+
+
+_email_limiter = _make_limiter(*LOGIN_FAILS_PER_EMAIL, table="login_fails_email")
+_client_limiter = _make_limiter(*LOGIN_ATTEMPTS_PER_CLIENT, table="login_attempts_client")
+_sessions = TTLCache(SESSION_TTL, max_entries=SESSION_MAX_ENTRIES)
+
+
+def _throttled(limiter, key):
+    return f"Too many login attempts. Try again in {int(limiter.retry_after(key)) + 1} s."
+
+
+def login_user(email: str, password: str, client_id: str = None):
+    """
+    Rate-limited authenticate_user. On success info also carries a session
+    "token" for verify_session; throttled attempts never reach the database.
+    Without a client_id (peer address unknown) only the per-email limit
+    applies: one shared bucket would let a single client lock everyone out.
+    """
+    email = email.strip().lower()
+    # hit() checks and counts in one step, so concurrent attempts can't all pass a check first
+    if client_id:
+        client_key = f"client:{client_id}"
+        if not _client_limiter.hit(client_key):
+            return False, _throttled(_client_limiter, client_key)
+    email_key = f"email:{email}"
+    if not _email_limiter.hit(email_key):
+        return False, _throttled(_email_limiter, email_key)
+
+    ok, info = authenticate_user(email, password)
+    if not ok:
+        return False, info
+    # only failures count against the email
+    _email_limiter.release(email_key)
+
+    token = secrets.token_urlsafe(32)
+    _sessions.set(token, info)
+    return True, {**info, "token": token}
+
+
+def verify_session(token: str):
+    """User info for a live session token (sliding expiry), else None."""
+    if not token:
+        return None
+    return _sessions.get(token)
+
+
+def logout_session(token: str):
+    if token:
+        _sessions.pop(token)
+
 # -----------------------------
 # Helper: list users (optional)
 # -----------------------------
@@ -1,45 +1,539 @@
 # utils/video_model.py
 import random
 import time
-from utils.processing import extract_frames, make_contact_sheet, detect_faces_in_frame, draw_face_boxes
+import base64
+import os
+import cv2
+import numpy as np
+from utils.processing import (extract_frames_at, make_contact_sheet, detect_faces_in_frame, draw_face_boxes,
+                              encode_jpeg, decode_jpeg, make_thumbnail, video_meta, read_window, read_frame_at,
+                              seek_exact)
+from utils.phash import (get_phash_index, video_signature, signature_from_hashes, keyframe_picks,
+                         DEFAULT_MAX_DISTANCE, VIDEO_KEYFRAMES)
+from utils import ingest
+from utils.artifacts import (clip_features, summarize_clip, combine_scores, artifact_score, FEATURE_NAMES,
+                             ARTIFACT_WEIGHT)
+from utils.sequential import RunningVerdict, HALF_WIDTH
+from utils.silhouette import SilhouetteStage, merge_summaries
 import io
 
-def analyze_video(uploaded_file, sample_seconds=1):
+def _nearest_faces(prev_frames, ts, sx, sy):
+    """Faces stored for the previous analysis' frame closest to timestamp ts, rescaled."""
+    if not prev_frames:
+        return []
+    _, faces = min(prev_frames, key=lambda f: abs(f[0] - ts))
+    return [[int(x * sx), int(y * sy), int(w * sx), int(h * sy)] for (x, y, w, h) in faces]
+
+
+def _unreadable():
+    """What every analyze path raises for a clip OpenCV cannot open or decode a single frame of."""
+    return ValueError("could not open this video or decode any of its frames")
+
+
+def _upload_suffix(uploaded_file):
+    """Extension of the uploaded file name; ".mp4" when there is none (API temp files have no str name)."""
+    name = getattr(uploaded_file, "name", None)
+    return (os.path.splitext(name)[1] if isinstance(name, str) else "") or ".mp4"
+
+
+def _frame_info(idx, ts, frame, faces, source):
+    """
+    Per-frame entry: a small annotated thumbnail for list views and the path of
+    the stored upload; the full annotated image is only drawn on demand
+    (see render_annotated_frame).
+    """
+    faces = [[int(x), int(y), int(w), int(h)] for (x, y, w, h) in faces]
+    return {
+        "index": int(idx),
+        "timestamp": float(ts),
+        "faces": faces,
+        "thumbnail": make_thumbnail(frame, faces),
+        "source": str(source),
+    }
+
+
+def _duplicate_fields(match):
+    """Verdict fields reused from a near-duplicate's stored result, plus analysis_id / duplicate_of."""
+    prev = match["result"]
+    return {
+        "verdict": prev["verdict"],
+        "confidence": prev["confidence"],
+        "gait_ok": prev["gait_ok"],
+        "gait_confidence": prev["gait_confidence"],
+        "analysis_id": match["analysis_id"],
+        "duplicate_of": {
+            "analysis_id": match["analysis_id"],
+            "distance": match["distance"],
+            "created_at": match["created_at"],
+        },
+    }
+
+
+def _store_video(index, hashes, verdicts, size, frames_info):
+    """
+    Record a fresh analysis under its keyframe signature so near-duplicates can
+    reuse it; verdicts holds verdict / confidence / gait_ok / gait_confidence,
+    size is the (width, height) the face boxes refer to. Returns the analysis_id
+    (None when dedup is off or there is no signature).
+    """
+    if index is None or not hashes:
+        return None
+    w, h = size
+    return index.add("video", hashes, {
+        **verdicts,
+        "width": int(w),
+        "height": int(h),
+        "frames": [[fi["timestamp"], fi["faces"]] for fi in frames_info],
+    })
+
+
+def render_annotated_frame(frame_info):
+    """
+    Full-resolution PNG (BytesIO) of a frame with its face boxes drawn, re-decoded
+    from the stored upload. None when the upload is gone (e.g. cleaned up).
+    """
+    frame = read_frame_at(frame_info["source"], frame_info["index"])
+    if frame is None:
+        return None
+    return draw_face_boxes(frame, frame_info["faces"])
+
+
+def analyze_video(uploaded_file, sample_seconds=1, dedup=True, max_distance=DEFAULT_MAX_DISTANCE,
+                  progress_callback=None, segments=1, detect_workers=0, early_exit=False,
+                  half_width=HALF_WIDTH, max_frames=None, time_budget=None, silhouettes=True):
     """
     uploaded_file: streamlit UploadedFile
+    dedup: match sampled keyframes against the perceptual-hash index and reuse
+           the verdict of a near-duplicate clip instead of re-running detection.
+           The keyframes are read by seeking before the clip is decoded, so a
+           duplicate costs a handful of frames (gait is None then); when the
+           frame count is unknown the lookup happens after the full decode.
+    progress_callback: optional fn(frame_info, done, total) called as each frame completes.
+    segments: > 1 splits the clip into that many time segments decoded and
+              detected in parallel worker processes (see utils.segments).
+    detect_workers: > 0 decodes here and runs detection in that many worker
+              processes fed through a shared-memory frame ring (see utils.framebuffer).
+    early_exit: decode frame by frame and stop as soon as the running per-frame
+              score settles the verdict (see utils.sequential); half_width,
+              max_frames (sampled frames) and time_budget (seconds) bound it.
+              Adds frames_used, frames_decoded, stopped and score_interval.
+              Decodes in this process: segments / detect_workers are ignored.
+    silhouettes: run background subtraction on every decoded frame and fill the
+              "gait" entry (bit-packed silhouettes + Gait Energy Image, see
+              utils.silhouette; None when off or for an early-exit duplicate).
+              Segment workers each run their own stage and the parts are merged.
     Returns:
       {
         verdict, confidence,
         gait_ok, gait_confidence,
-        frames_info: [ {index, timestamp, faces: [bboxes], annotated_frame_bytes} ],
-        contact_sheet: png bytes
+        frames_info: [ {index, timestamp, faces: [bboxes], thumbnail, source} ],
+        contact_sheet: png bytes,
+        analysis_id, duplicate_of: {analysis_id, distance, created_at} | None
       }
+    Raises ValueError when the clip cannot be opened or yields no frames.
     """
-    # rewind file to start
-    uploaded_file.seek(0)
-    frames = extract_frames(uploaded_file, fps_sample=sample_seconds)
+    # one copy on disk for every decode path and for on-demand zoom (frames keep only thumbnails)
+    suffix = _upload_suffix(uploaded_file)
+    path, _ = ingest.save_upload(uploaded_file, suffix=suffix)
+    if early_exit:
+        return _analyze_video_early_exit(path, sample_seconds, dedup, max_distance, progress_callback,
+                                         RunningVerdict(half_width=half_width, max_frames=max_frames,
+                                                        time_budget=time_budget),
+                                         SilhouetteStage() if silhouettes else None)
+    hashes = []
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            raise _unreadable()
+        keyframes, hashes, match = _keyframe_lookup(cap, sample_seconds, max_distance) if dedup else ([], [], None)
+    finally:
+        cap.release()
+    if match is not None:
+        return _keyframe_duplicate(match, keyframes, path)
+    if segments and segments > 1:
+        return _analyze_video_parallel(path, sample_seconds, dedup, max_distance,
+                                       progress_callback, segments, silhouettes, hashes)
+    if detect_workers and detect_workers > 0:
+        return _analyze_video_shared(path, sample_seconds, dedup, max_distance,
+                                     progress_callback, detect_workers, silhouettes, hashes)
+    stage = SilhouetteStage() if silhouettes else None
+    frames = extract_frames_at(path, fps_sample=sample_seconds, frame_callback=stage and stage.feed)
+    if not frames:
+        raise _unreadable()
+
+    index = get_phash_index() if dedup else None
+    match = None
+    if index is not None and not hashes:
+        # frame count unknown: the keyframes could not be picked before decoding
+        hashes = video_signature(frames)
+        match = index.lookup("video", hashes, max_distance=max_distance) if hashes else None
+
     frames_info = []
+    if match is not None:
+        prev = match["result"]
+        h, w = frames[0][2].shape[:2]
+        sx, sy = w / prev["width"], h / prev["height"]
+        for idx, ts, frame in frames:
+            frames_info.append(_frame_info(idx, ts, frame, _nearest_faces(prev["frames"], ts, sx, sy), path))
+            if progress_callback:
+                progress_callback(frames_info[-1], len(frames_info), len(frames))
+        return {
+            **_duplicate_fields(match),
+            "frames_info": frames_info,
+            "contact_sheet": make_contact_sheet(frames, max_cols=4, thumb_w=320),
+            "gait": stage.result() if stage else None,
+        }
+
     for idx, ts, frame in frames:
-        faces = detect_faces_in_frame(frame)
-        annotated_buf = draw_face_boxes(frame, faces) if faces else None
-        frames_info.append({
-            "index": int(idx),
-            "timestamp": float(ts),
-            "faces": [ [int(x),int(y),int(w),int(h)] for (x,y,w,h) in faces ],
-            "annotated_frame": annotated_buf
-        })
+        frames_info.append(_frame_info(idx, ts, frame, detect_faces_in_frame(frame), path))
+        if progress_callback:
+            progress_callback(frames_info[-1], len(frames_info), len(frames))
     contact_buf = make_contact_sheet(frames, max_cols=4, thumb_w=320)
+    p_art, artifacts = summarize_clip(*clip_features((f, fi["faces"]) for (_, _, f), fi in zip(frames, frames_info)))
     # dummy deepfake + gait predictions (replace with actual model inference)
     time.sleep(0.9)
-    verdict = random.choice(["authentic", "deepfake"])
-    confidence = random.uniform(65, 97)
-    gait_ok = random.choice([True, False])
-    gait_confidence = random.uniform(60, 98)
+    verdict, confidence = combine_scores(random.random(), p_art)
+    verdicts = {"verdict": verdict, "confidence": confidence,
+                "gait_ok": random.choice([True, False]), "gait_confidence": random.uniform(60, 98)}
+    h, w = frames[0][2].shape[:2]
+    return {
+        **verdicts,
+        "frames_info": frames_info,
+        "contact_sheet": contact_buf,
+        "artifacts": {"score": p_art, **artifacts},
+        "gait": stage.result() if stage else None,
+        "analysis_id": _store_video(index, hashes, verdicts, (w, h), frames_info),
+        "duplicate_of": None,
+    }
+
+
+def _analyze_video_parallel(path, sample_seconds, dedup, max_distance, progress_callback, segments,
+                            silhouettes, hashes):
+    """analyze_video over N segments decoded in worker processes, merged in timestamp order."""
+    from utils.segments import analyze_segments
+
+    records, used, gait = analyze_segments(path, sample_seconds=sample_seconds, n_segments=segments,
+                                           silhouettes=silhouettes)
+    res = _result_from_records(records, path, dedup, max_distance, progress_callback, hashes)
+    res["gait"] = gait
+    res["segments"] = used
+    return res
+
+
+def _analyze_video_shared(path, sample_seconds, dedup, max_distance, progress_callback, detect_workers,
+                          silhouettes, hashes):
+    """analyze_video with decoding here and detection in workers fed through shared memory."""
+    from utils.framebuffer import detect_frames_shared
+
+    stage = SilhouetteStage() if silhouettes else None
+    records = detect_frames_shared(path, fps_sample=sample_seconds, n_workers=detect_workers,
+                                   frame_callback=stage and stage.feed)
+    res = _result_from_records(records, path, dedup, max_distance, progress_callback, hashes)
+    res["gait"] = stage.result() if stage else None
+    res["detect_workers"] = detect_workers
+    return res
+
+
+def _read_keyframes(cap, total, sample_interval, fps):
+    """The frames video_signature would pick, read by seeking (frame count must be known)."""
+    samples = -(-total // sample_interval)
+    out = []
+    for i in keyframe_picks(samples, VIDEO_KEYFRAMES):
+        idx = int(i) * sample_interval
+        seek_exact(cap, idx)
+        ret, frame = cap.read()
+        if ret:
+            out.append((idx, idx / fps, frame))
+    return out
+
+
+def _keyframe_lookup(cap, sample_seconds, max_distance):
+    """
+    Near-duplicate lookup before any full decode, on the keyframes
+    video_signature would pick, read by seeking an open capture.
+    Returns (keyframes, hashes, match); ([], [], None) when the frame count is
+    unknown, so the caller hashes the decoded frames instead.
+    """
+    fps, total = video_meta(cap)
+    if not total:
+        return [], [], None
+    keyframes = _read_keyframes(cap, total, max(1, int(fps * sample_seconds)), fps)
+    hashes = video_signature(keyframes) if keyframes else []
+    match = get_phash_index().lookup("video", hashes, max_distance=max_distance) if hashes else None
+    return keyframes, hashes, match
+
+
+def _keyframe_duplicate(match, keyframes, path):
+    """analyze_video result for a near-duplicate found by _keyframe_lookup (only keyframes decoded)."""
+    prev = match["result"]
+    h, w = keyframes[0][2].shape[:2]
+    sx, sy = w / prev["width"], h / prev["height"]
+    return {
+        **_duplicate_fields(match),
+        "frames_info": [_frame_info(idx, ts, frame, _nearest_faces(prev["frames"], ts, sx, sy), path)
+                        for idx, ts, frame in keyframes],
+        "contact_sheet": make_contact_sheet(keyframes, max_cols=4, thumb_w=320),
+        "gait": None,  # only keyframes were decoded
+    }
+
+
+def _analyze_video_early_exit(path, sample_seconds, dedup, max_distance, progress_callback, running,
+                              stage=None):
+    """
+    analyze_video that decodes one sampled frame at a time and stops once
+    `running` says the verdict is settled. Near-duplicate lookup uses the same
+    keyframes as video_signature, read by seeking, so it doesn't need the whole clip.
+    """
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            raise _unreadable()
+        fps, total = video_meta(cap)
+        sample_interval = max(1, int(fps * sample_seconds))
+
+        index = get_phash_index() if dedup and total else None
+        keyframes, hashes, match = (_keyframe_lookup(cap, sample_seconds, max_distance) if index is not None
+                                     else ([], [], None))
+        if match is not None:
+            return {**_keyframe_duplicate(match, keyframes, path),
+                    "frames_used": 0, "frames_decoded": len(keyframes), "stopped": "duplicate"}
+
+        # dummy clip-level model probability (replace with per-frame model output)
+        model_prob = random.random()
+        expected = -(-total // sample_interval) if total else 0
+        if running.max_frames:
+            expected = min(expected, running.max_frames) if expected else running.max_frames
+        frames, frames_info, rows, luma = [], [], [], []
+        reason = "end"
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        pos = 0
+        while True:
+            batch, eof = read_window(cap, pos, pos + sample_interval, sample_interval, seek=False,
+                                     frame_callback=stage and stage.feed)
+            pos += sample_interval
+            for idx, frame in batch:
+                faces = [[int(x), int(y), int(w), int(h)] for (x, y, w, h) in detect_faces_in_frame(frame)]
+                feats, lum = clip_features([(frame, faces)])
+                rows.append(feats[0])
+                luma.append(lum[0])
+                score = None
+                if faces:
+                    score = (1 - ARTIFACT_WEIGHT) * model_prob + ARTIFACT_WEIGHT * artifact_score(feats)
+                running.add(score)
+                frames.append((idx, idx / fps, frame))
+                frames_info.append(_frame_info(idx, idx / fps, frame, faces, path))
+                if progress_callback:
+                    progress_callback(frames_info[-1], len(frames_info), max(expected, len(frames_info)))
+            if eof:
+                break
+            stop = running.stop_reason()
+            if stop:
+                reason = stop
+                break
+    finally:
+        cap.release()
+    if not frames:
+        raise _unreadable()
+
+    contact_buf = make_contact_sheet(frames, max_cols=4, thumb_w=320)
+    p_art, artifacts = summarize_clip(rows, luma)
+    # dummy gait prediction (replace with actual model inference)
+    time.sleep(0.9)
+    if running.n:
+        p = running.mean
+        verdict, confidence = ("deepfake" if p >= 0.5 else "authentic"), 50 + abs(p - 0.5) * 100
+    else:
+        verdict, confidence = combine_scores(model_prob, p_art)
+    verdicts = {"verdict": verdict, "confidence": confidence,
+                "gait_ok": random.choice([True, False]), "gait_confidence": random.uniform(60, 98)}
+    h, w = frames[0][2].shape[:2]
+    return {
+        **verdicts,
+        "frames_info": frames_info,
+        "contact_sheet": contact_buf,
+        "artifacts": {"score": p_art, **artifacts},
+        "gait": stage.result() if stage else None,
+        "analysis_id": _store_video(index, hashes, verdicts, (w, h), frames_info),
+        "duplicate_of": None,
+        **running.summary(reason),
+    }
+
+
+def _result_from_records(records, path, dedup, max_distance, progress_callback, hashes):
+    """
+    Build the analyze_video result from per-frame records produced by worker processes.
+    hashes: keyframe signature already looked up (no match) before the workers
+    started; empty when that was not possible, then the records are looked up here.
+    """
+    if not records:
+        raise _unreadable()
+    frames_info = []
+    for rec in records:
+        frames_info.append({**{k: rec[k] for k in ("index", "timestamp", "faces", "thumbnail")}, "source": str(path)})
+        if progress_callback:
+            progress_callback(frames_info[-1], len(frames_info), len(records))
+    contact_buf = make_contact_sheet([(r["index"], r["timestamp"], r["sheet_frame"]) for r in records],
+                                     max_cols=4, thumb_w=320)
+
+    p_art, artifacts = summarize_clip([r["artifacts"] for r in records], [r["luma"] for r in records])
+    index = get_phash_index() if dedup else None
+    match = None
+    if index is not None and not hashes:
+        hashes = signature_from_hashes([r["phash"] for r in records])
+        match = index.lookup("video", hashes, max_distance=max_distance) if hashes else None
+    if match is not None:
+        fields = _duplicate_fields(match)
+    else:
+        # dummy deepfake + gait predictions (replace with actual model inference)
+        time.sleep(0.9)
+        verdict, confidence = combine_scores(random.random(), p_art)
+        verdicts = {"verdict": verdict, "confidence": confidence,
+                    "gait_ok": random.choice([True, False]), "gait_confidence": random.uniform(60, 98)}
+        fields = {**verdicts, "analysis_id": _store_video(index, hashes, verdicts, records[0]["size"], frames_info),
+                  "duplicate_of": None}
+    return {
+        **fields,
+        "frames_info": frames_info,
+        "contact_sheet": contact_buf,
+        "artifacts": {"score": p_art, **artifacts},
+    }
+
+
+# -------------------------------
+# LONG CLIPS: WINDOWED, RESUMABLE ANALYSIS
+# -------------------------------
+# Contact sheet keyframes taken from at most this many windows.
+CONTACT_SHEET_WINDOWS = 16
+
+
+def _b64(buf):
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def _analyze_window(cap, window, start, end, fps, sample_interval, seek, silhouettes):
+    """Decode + detect one time window; returns its (JSON-serializable) checkpoint."""
+    # one stage per window so a resumed run can merge checkpointed windows (see merge_summaries)
+    stage = SilhouetteStage() if silhouettes else None
+    frames, eof = read_window(cap, start, end, sample_interval, seek=seek, frame_callback=stage and stage.feed)
+    out = []
+    for idx, frame in frames:
+        faces = [[int(x), int(y), int(w), int(h)] for (x, y, w, h) in detect_faces_in_frame(frame)]
+        out.append({
+            "index": int(idx),
+            "timestamp": idx / fps,
+            "faces": faces,
+            "thumbnail": _b64(make_thumbnail(frame, faces)),
+        })
+    per_frame, luma = clip_features((frame, fr["faces"]) for (_, frame), fr in zip(frames, out))
+    for fr, feats, lum in zip(out, per_frame, luma):
+        # NaN (no face) -> None so the checkpoint stays valid JSON
+        fr["artifacts"] = None if np.isnan(lum) else feats.tolist()
+        fr["luma"] = None if np.isnan(lum) else float(lum)
+    keyframe = None
+    if frames:
+        small = cv2.resize(frames[0][1], (320, max(1, int(320 * frames[0][1].shape[0] / frames[0][1].shape[1]))))
+        keyframe = base64.b64encode(encode_jpeg(small)).decode("ascii")
+    # dummy per-window deepfake / gait scores (replace with actual model inference)
+    time.sleep(0.05)
+    return {
+        "window": window,
+        "start_frame": start,
+        "end_frame": end,
+        "eof": eof,
+        "frames": out,
+        "keyframe": keyframe,
+        "deepfake_prob": random.random(),
+        "gait_score": random.uniform(60, 98),
+        "gait": stage.summary() if stage else None,
+    }
+
+
+def analyze_long_video(uploaded_file, sample_seconds=1, window_seconds=60, resume=True, progress_callback=None,
+                       silhouettes=True):
+    """
+    Analysis of arbitrarily long clips with bounded memory.
+    The upload is streamed to disk in chunks, then processed one time window at
+    a time; each window's result is checkpointed so a crashed or cancelled run
+    (Streamlit "Stop", server restart) picks up at the first missing window.
+    progress_callback: optional fn(frame_info, done_windows, total_windows) per frame.
+    silhouettes: as in analyze_video; each window has its own stage, merged at the end.
+    Returns the same shape as analyze_video, plus windows / windows_resumed / source;
+    raises ValueError like analyze_video.
+    """
+    suffix = _upload_suffix(uploaded_file)
+    path, digest = ingest.save_upload(uploaded_file, suffix=suffix)
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise _unreadable()
+    fps, total = video_meta(cap)
+    sample_interval = max(1, int(fps * sample_seconds))
+    # windows start on the sampling grid so no sampled frame straddles two windows
+    window_frames = max(sample_interval, int(fps * window_seconds) // sample_interval * sample_interval)
+    n_windows = -(-total // window_frames) if total else None
+    ckpt_dir = ingest.checkpoint_dir(digest, {"sample": sample_seconds, "window": window_seconds,
+                                              "gait": int(bool(silhouettes))})
+
+    windows, resumed, seek = [], 0, True
+    window = 0
+    try:
+        while n_windows is None or window < n_windows:
+            start = window * window_frames
+            data = ingest.load_checkpoint(ckpt_dir, window) if resume else None
+            if data is not None:
+                resumed += 1
+                seek = True
+            else:
+                data = _analyze_window(cap, window, start, start + window_frames, fps, sample_interval, seek,
+                                       silhouettes)
+                ingest.save_checkpoint(ckpt_dir, window, data)
+                seek = False  # the capture is already positioned at the next window
+            windows.append(data)
+            if progress_callback:
+                for fr in data["frames"]:
+                    progress_callback(_long_frame_info(fr, path), window + 1, n_windows or window + 1)
+            window += 1
+            if data["eof"]:
+                break
+    finally:
+        cap.release()
+
+    frames_info = [_long_frame_info(fr, path) for w in windows for fr in w["frames"]]
+    if not frames_info:
+        raise _unreadable()
+    step = max(1, -(-len(windows) // CONTACT_SHEET_WINDOWS))
+    sheet_frames = [(w["frames"][0]["index"], w["frames"][0]["timestamp"],
+                     decode_jpeg(base64.b64decode(w["keyframe"])))
+                    for w in windows[::step] if w["keyframe"]]
+    probs = [w["deepfake_prob"] for w in windows] or [0.5]
+    all_frames = [fr for w in windows for fr in w["frames"]]
+    p_art, artifacts = summarize_clip(
+        [fr["artifacts"] if fr.get("artifacts") else [np.nan] * len(FEATURE_NAMES) for fr in all_frames],
+        [fr["luma"] if fr.get("luma") is not None else np.nan for fr in all_frames],
+    )
+    verdict, confidence = combine_scores(sum(probs) / len(probs), p_art)
+    gait_confidence = sum(w["gait_score"] for w in windows) / max(1, len(windows))
     return {
         "verdict": verdict,
         "confidence": confidence,
-        "gait_ok": gait_ok,
+        "gait_ok": gait_confidence >= 75,
         "gait_confidence": gait_confidence,
         "frames_info": frames_info,
-        "contact_sheet": contact_buf
+        "contact_sheet": make_contact_sheet(sheet_frames, max_cols=4, thumb_w=320),
+        "artifacts": {"score": p_art, **artifacts},
+        "gait": merge_summaries(w["gait"] for w in windows if w.get("gait")) if silhouettes else None,
+        "analysis_id": None,
+        "duplicate_of": None,
+        "windows": len(windows),
+        "windows_resumed": resumed,
+        "source": str(path),
+    }
+
+
+def _long_frame_info(fr, path):
+    return {
+        "index": fr["index"],
+        "timestamp": fr["timestamp"],
+        "faces": fr["faces"],
+        "thumbnail": io.BytesIO(base64.b64decode(fr["thumbnail"])),
+        "source": str(path),
     }